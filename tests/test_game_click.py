@@ -0,0 +1,41 @@
+import pytest
+
+pygame = pytest.importorskip("pygame")
+
+
+@pytest.fixture
+def game(monkeypatch):
+    monkeypatch.setenv("SDL_VIDEODRIVER", "dummy")
+    monkeypatch.setenv("AI_CACHE", "false")
+    from village_simulation.game.game import VillageGame
+
+    game = VillageGame()
+    yield game
+    game.ai_controller.close()
+    pygame.quit()
+
+
+def test_click_in_world_selects_villager(game):
+    villager = game.villagers[0]
+    # Камера ставится так, чтобы житель оказался в открытой части мира
+    view = game._world_viewport()
+    game.camera_x = int(villager.position[0]) - view.centerx
+    game.camera_y = int(villager.position[1]) - view.centery
+
+    pygame.event.post(pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=view.center, button=1))
+    game.handle_events()
+
+    selected = game.selected_villager
+    assert selected is not None
+    assert game.show_info
+    dx = view.centerx + game.camera_x - selected.position[0]
+    dy = view.centery + game.camera_y - selected.position[1]
+    assert dx * dx + dy * dy <= selected.size * selected.size
+
+
+def test_click_on_panel_does_not_select(game):
+    # Точка под верхней панелью, вне кнопок
+    pygame.event.post(pygame.event.Event(pygame.MOUSEBUTTONDOWN, pos=(600, 5), button=1))
+    game.handle_events()
+
+    assert game.selected_villager is None
@@ -0,0 +1,39 @@
+import json
+
+from village_simulation.ai.streaming import ActionStreamParser
+
+
+def feed_all(parser, text, size):
+    actions = []
+    for start in range(0, len(text), size):
+        actions.extend(parser.feed(text[start:start + size]))
+    return actions
+
+
+def test_actions_dispatched_as_objects_close():
+    response = json.dumps({
+        "analysis": "Мало еды",
+        "actions": [
+            {"type": "DISTRIBUTE_RESOURCES", "target": "food", "value": 100, "priority": 1},
+            {"type": "CREATE_JOBS", "target": "farm", "value": "5", "priority": 2},
+        ],
+    }, ensure_ascii=False)
+    parser = ActionStreamParser()
+
+    actions = feed_all(parser, response, 7)
+
+    assert [action["type"] for action in actions] == ["DISTRIBUTE_RESOURCES", "CREATE_JOBS"]
+    assert parser.done
+
+
+def test_actions_opener_inside_analysis_string_is_ignored():
+    response = json.dumps({
+        "analysis": 'Модель ответила: "actions": [{"type": "FAKE"}] - это цитата',
+        "actions": [{"type": "INVEST", "target": "tools", "value": 10, "priority": 3}],
+    }, ensure_ascii=False)
+
+    for size in (1, 5, len(response)):
+        parser = ActionStreamParser()
+        actions = feed_all(parser, response, size)
+        assert [action["type"] for action in actions] == ["INVEST"]
+        assert parser.done
@@ -1,33 +1,58 @@
 import requests
 import json
 import logging
+import queue
+import threading
 import time
 import os
-from typing import Dict, List, Optional
+import re
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 import pygame
+from village_simulation.ai.backends import Backend, BackendPool
+from village_simulation.ai.prompt_builder import PromptBuilder
+from village_simulation.ai.response_cache import ResponseCache
+from village_simulation.ai.streaming import ActionStreamParser, iter_sse_content
 
 class AIController:
-    def __init__(self):
+    def __init__(self, max_in_flight: int = 1):
         self.logger = logging.getLogger('ai_debug')
         
-        # Конфигурация API
-        self.api_type = os.getenv('AI_API_TYPE', 'openrouter')  # openrouter, lmstudio, или vercel
-        
-        if self.api_type == 'openrouter':
-            # Получаем API ключ из переменной окружения или используем резервный ключ
-            self.api_key = os.getenv('OPENROUTER_API_KEY', 
-                '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')
-            self.api_url = "https://openrouter.ai/api/v1/chat/completions"
-            self.model = "google/gemini-2.0-pro-exp-02-05:free"  # или другая быстрая модель
-        elif self.api_type == 'lmstudio':
-            self.api_url = "http://localhost:1234/v1/chat/completions"
-            self.model = "local-model"
-        elif self.api_type == 'vercel':
-            self.api_key = os.getenv('VERCEL_AI_API_KEY')
-            self.api_url = "https://api.vercel.ai/v1/chat/completions"
-            self.model = "gemini-pro"
+        # Асинхронные запросы: выполняются в рабочих потоках, результаты
+        # забираются главным потоком через poll()
+        self.max_in_flight = max_in_flight
+        # Отменённый запрос занимает поток, пока не вернётся блокирующий вызов,
+        # поэтому потоков вдвое больше лимита - новый запрос не ждёт старый
+        self._executor = ThreadPoolExecutor(max_workers=2 * max_in_flight,
+                                            thread_name_prefix='ai-request')
+        self._in_flight: Dict[Future, threading.Event] = {}
+        self._completed: "queue.Queue[Future]" = queue.Queue()
+        
+        # Потоковый режим: действия приходят по мере генерации ответа
+        self.streaming = os.getenv('AI_STREAMING', 'false').lower() in ('1', 'true', 'yes')
+        self._streamed: "queue.Queue[Tuple[threading.Event, Dict]]" = queue.Queue()
+        
+        # Кэш ответов по квантованному состоянию деревни (AI_CACHE=false - отключить)
+        self.cache: Optional[ResponseCache] = None
+        if os.getenv('AI_CACHE', 'true').lower() in ('1', 'true', 'yes'):
+            self.cache = ResponseCache(
+                os.getenv('AI_CACHE_PATH', 'data/ai_response_cache.sqlite'),
+                ttl=float(os.getenv('AI_CACHE_TTL', '1800'))
+            )
+        
+        # Сжатое описание состояния деревни с бюджетом токенов
+        self.prompt_builder = PromptBuilder(token_budget=int(os.getenv('AI_PROMPT_TOKENS', '400')))
+        
+        # Конфигурация API: основной и запасные (AI_BACKENDS=openrouter,lmstudio)
+        self.pool = BackendPool.from_env()
+        # Потоки для параллельных (дублирующих) запросов к разным API; с запасом,
+        # так как проигравший запрос освобождает поток только после заголовков ответа
+        self._hedge_executor = ThreadPoolExecutor(
+            max_workers=2 * max_in_flight * len(self.pool.backends),
+            thread_name_prefix='ai-backend'
+        )
         
         # Настройка сессии с повторными попытками
         self.session = requests.Session()
@@ -55,75 +80,374 @@ class AIController:
     ]
 }"""
 
-    def send_request(self, prompt: str) -> Optional[Dict]:
-        """Отправка запроса к API"""
+    # Настройки основного API (первого в пуле)
+    @property
+    def api_type(self) -> str:
+        return self.pool.primary.api_type
+    
+    @property
+    def api_url(self) -> str:
+        return self.pool.primary.api_url
+    
+    @api_url.setter
+    def api_url(self, value: str):
+        self.pool.primary.api_url = value
+    
+    @property
+    def api_key(self) -> Optional[str]:
+        return self.pool.primary.api_key
+    
+    @property
+    def model(self) -> str:
+        return self.pool.primary.model
+    
+    @property
+    def in_flight(self) -> int:
+        """Число неотменённых запросов, ответ на которые ещё не забран через poll()"""
+        return len(self._in_flight)
+    
+    def submit_cached(self, statistics: Dict) -> Optional[Future]:
+        """Ответ из кэша для близкого состояния деревни как завершённый запрос.
+
+        None при промахе, отключённом кэше или достигнутом лимите запросов.
+        Позволяет не собирать промпт, если ответ уже есть.
+        """
+        if self.cache is None or len(self._in_flight) >= self.max_in_flight:
+            return None
+        # Подходит ответ любой модели пула; первой проверяется та, что опрашивается первой
+        # Каждый вызов учитывается как одно обращение, сколько бы ключей ни проверялось
+        for backend in self.pool.ordered():
+            cached = self.cache.peek(self._cache_key(backend, statistics))
+            if cached is not None:
+                break
+        self.cache.count_lookup(cached is not None)
+        if cached is None:
+            return None
+        
+        self.logger.debug(f"Ответ {backend.api_type} взят из кэша: {self.cache.stats()}")
+        cancelled = threading.Event()
+        future = Future()
+        future.set_result(cached)
+        if self.streaming:
+            # В потоковом режиме действия отдаются через очередь
+            for action in self.interpret_response(cached):
+                self._streamed.put((cancelled, action))
+        self._in_flight[future] = cancelled
+        future.add_done_callback(self._completed.put)
+        return future
+    
+    def submit(self, prompt: str, statistics: Optional[Dict] = None,
+               check_cache: bool = True) -> Optional[Future]:
+        """Отправка запроса в фоне; None, если достигнут лимит одновременных запросов.
+
+        Если передана статистика модели (get_statistics()), ответ сохраняется
+        в кэш, а при check_cache сначала проверяется кэш (см. submit_cached).
+        """
+        if len(self._in_flight) >= self.max_in_flight:
+            self.logger.warning(f"Запрос не отправлен: уже выполняется {len(self._in_flight)}")
+            return None
+        if check_cache and statistics is not None:
+            future = self.submit_cached(statistics)
+            if future is not None:
+                return future
+        cancelled = threading.Event()
+        cache_statistics = statistics if self.cache is not None else None
+        
+        future = self._executor.submit(self._run_request, prompt, cancelled, cache_statistics)
+        self._in_flight[future] = cancelled
+        future.add_done_callback(self._completed.put)
+        return future
+    
+    def _cache_key(self, backend: Backend, statistics: Dict) -> str:
+        """Ключ кэша ответа конкретной модели конкретного API"""
+        return self.cache.key(self.system_prompt, f"{backend.api_type}/{backend.model}", statistics)
+    
+    def _run_request(self, prompt: str, cancelled: threading.Event,
+                     cache_statistics: Optional[Dict] = None) -> Optional[Dict]:
+        if cancelled.is_set():
+            return None
+        if self.streaming:
+            backend, response = self._hedged_request(
+                prompt, cancelled, lambda action: self._streamed.put((cancelled, action)))
+        else:
+            backend, response = self._hedged_request(prompt, cancelled)
+        if cache_statistics is not None and isinstance(response, dict) and not cancelled.is_set():
+            # Ответ сохраняется под моделью API, который его дал
+            self.cache.put(self._cache_key(backend, cache_statistics), response)
+        return response
+    
+    def _hedged_request(self, prompt: str, cancelled: threading.Event,
+                        on_action: Optional[Callable[[Dict], None]] = None
+                        ) -> Tuple[Optional[Backend], Optional[Dict]]:
+        """Запрос к пулу API с дублированием.
+
+        Если API не ответил за 90-й перцентиль своих задержек (или ответил
+        ошибкой), тот же запрос уходит следующему API пула. Берётся первый
+        корректный ответ, остальные запросы прерываются и учитываются в пуле
+        как обогнанные. В потоковом режиме действия принимаются только от
+        API, приславшего первое действие.
+
+        Возвращает API, давший ответ, и сам ответ (None, None - ответа нет).
+        """
+        backends = self.pool.ordered()
+        results: "queue.Queue[Tuple[Backend, Optional[Dict]]]" = queue.Queue()
+        # Запущенные попытки: API, время старта, событие остановки, учтена ли в пуле
+        attempts: List[Dict] = []
+        winner: List[Backend] = []
+        lock = threading.Lock()
+        
+        def gate(backend: Backend) -> Callable[[Dict], None]:
+            def deliver(action: Dict):
+                with lock:
+                    if not winner:
+                        winner.append(backend)
+                    if winner[0] is not backend:
+                        return
+                on_action(action)
+            return deliver
+        
+        def attempt(state: Dict):
+            backend, stop = state['backend'], state['stop']
+            if on_action is None:
+                response = self.send_request(prompt, backend, stop)
+            else:
+                response = self.stream_request(prompt, gate(backend), stop, backend)
+            valid = isinstance(response, dict) and 'actions' in response
+            with lock:
+                # Прерванный запрос учитывается при остановке (как обогнанный)
+                if not stop.is_set():
+                    self.pool.record(backend, time.perf_counter() - state['start'], valid)
+                    state['recorded'] = True
+            results.put((backend, response if valid else None))
+        
+        def launch(backend: Backend) -> float:
+            state = {'backend': backend, 'start': time.perf_counter(),
+                     'stop': threading.Event(), 'recorded': False}
+            attempts.append(state)
+            self._hedge_executor.submit(attempt, state)
+            return state['start'] + self.pool.hedge_delay(backend)
+        
+        response, answered_by = None, None
+        deadline = launch(backends[0])
+        launched, finished = 1, 0
+        while finished < launched and not cancelled.is_set():
+            can_hedge = launched < len(backends)
+            wait = min(0.1, max(0.0, deadline - time.perf_counter())) if can_hedge else 0.1
+            try:
+                backend, result = results.get(timeout=wait)
+            except queue.Empty:
+                if can_hedge and time.perf_counter() >= deadline:
+                    self.logger.debug(f"Нет ответа за p90, дублируем запрос в {backends[launched].api_type}")
+                    deadline = launch(backends[launched])
+                    launched += 1
+                continue
+            
+            finished += 1
+            if result is not None and (not winner or winner[0] is backend):
+                self.logger.debug(f"Ответ получен от {backend.api_type}")
+                response, answered_by = result, backend
+                break
+            if finished == launched and launched < len(backends):
+                # Все отправленные запросы неудачны - сразу пробуем следующий API
+                deadline = launch(backends[launched])
+                launched += 1
+        
+        now = time.perf_counter()
+        with lock:
+            for state in attempts:
+                state['stop'].set()
+                # Отмена игроком ничего не говорит о скорости API
+                if response is not None and not state['recorded']:
+                    self.pool.record_timeout(state['backend'], now - state['start'])
+        return answered_by, response
+    
+    def cancel(self, future: Future) -> bool:
+        """Отмена запроса; ответ уже начатого запроса будет отброшен.
+
+        Запрос сразу перестаёт учитываться в in_flight и освобождает место
+        для следующего, даже если его поток ещё ждёт ответа сервера.
+        """
+        cancelled = self._in_flight.pop(future, None)
+        if cancelled is None:
+            return False
+        cancelled.set()
+        future.cancel()
+        self.logger.debug("Запрос к ИИ отменён")
+        return True
+    
+    def cancel_all(self):
+        """Отмена всех незавершённых запросов"""
+        for future in list(self._in_flight):
+            self.cancel(future)
+    
+    def poll(self) -> List[Dict]:
+        """Действия из завершившихся запросов (вызывается из главного потока).
+
+        В потоковом режиме действия отдаются по одному, как только они
+        пришли и прошли проверку, в порядке генерации.
+        """
+        actions = []
+        while True:
+            try:
+                cancelled, action = self._streamed.get_nowait()
+            except queue.Empty:
+                break
+            if not cancelled.is_set():
+                actions.append(action)
+        
+        while True:
+            try:
+                future = self._completed.get_nowait()
+            except queue.Empty:
+                break
+            cancelled = self._in_flight.pop(future, None)
+            if cancelled is None or cancelled.is_set() or future.cancelled():
+                continue
+            error = future.exception()
+            if error is not None:
+                self.logger.error(f"Ошибка запроса: {str(error)}")
+                continue
+            response = future.result()
+            if response is not None and not self.streaming:
+                actions.extend(self.interpret_response(response))
+        return actions
+    
+    def close(self):
+        """Отмена запросов и остановка рабочих потоков"""
+        self.cancel_all()
+        self._executor.shutdown(wait=False)
+        self._hedge_executor.shutdown(wait=False)
+        if self.cache is not None:
+            self.cache.close()
+    
+    def _build_request(self, prompt: str, stream: bool = False,
+                       backend: Optional[Backend] = None) -> Tuple[Dict, Dict]:
+        """Заголовки и тело запроса к API"""
+        backend = backend or self.pool.primary
+        headers = {"Content-Type": "application/json"}
+        if backend.api_type == 'openrouter':
+            headers["Authorization"] = f"Bearer {backend.api_key}"
+            headers["HTTP-Referer"] = "https://github.com/your-repo"  # требуется для OpenRouter
+            headers["X-Title"] = "Village Simulation Game"
+        elif backend.api_type == 'vercel':
+            headers["Authorization"] = f"Bearer {backend.api_key}"
+        
+        messages = [
+            {"role": "system", "content": self.system_prompt},
+            {"role": "user", "content": prompt}
+        ]
+        
+        payload = {
+            "messages": messages,
+            "model": backend.model,
+            "temperature": 0.7,
+            "max_tokens": 800,
+            "stream": stream
+        }
+        return headers, payload
+    
+    def _parse_content(self, content: str) -> Optional[Dict]:
+        """Извлечение JSON из текста ответа модели"""
+        json_match = re.search(r'```json\n(.*?)\n```', content, re.DOTALL)
+        if json_match:
+            json_str = json_match.group(1)
+            return json.loads(json_str)
+        else:
+            # Пробуем распарсить весь ответ как JSON
+            try:
+                return json.loads(content)
+            except:
+                self.logger.warning("Не удалось распарсить JSON")
+                return None
+    
+    def send_request(self, prompt: str, backend: Optional[Backend] = None,
+                     cancelled: Optional[threading.Event] = None) -> Optional[Dict]:
+        """Отправка запроса к API (блокирующая; из игрового цикла - через submit).
+
+        Если cancelled установлено до получения тела ответа, соединение
+        закрывается без чтения ответа и возвращается None.
+        """
+        backend = backend or self.pool.primary
         try:
-            self.logger.debug(f"Отправка запроса к {self.api_type}")
-            
-            headers = {"Content-Type": "application/json"}
-            if self.api_type == 'openrouter':
-                headers["Authorization"] = f"Bearer {self.api_key}"
-                headers["HTTP-Referer"] = "https://github.com/your-repo"  # требуется для OpenRouter
-                headers["X-Title"] = "Village Simulation Game"
-            elif self.api_type == 'vercel':
-                headers["Authorization"] = f"Bearer {self.api_key}"
-            
-            messages = [
-                {"role": "system", "content": self.system_prompt},
-                {"role": "user", "content": prompt}
-            ]
-            
-            payload = {
-                "messages": messages,
-                "model": self.model,
-                "temperature": 0.7,
-                "max_tokens": 800,
-                "stream": False
-            }
+            self.logger.debug(f"Отправка запроса к {backend.api_type}")
+            headers, payload = self._build_request(prompt, backend=backend)
             
-            # Отправляем запрос
-            response = self.session.post(
-                self.api_url,
+            # Тело читается отдельно, чтобы прерванный запрос не дочитывался
+            with self.session.post(
+                backend.api_url,
                 json=payload,
                 headers=headers,
-                timeout=30  # уменьшаем таймаут для быстрых моделей
-            )
-            
-            self.logger.debug(f"Получен ответ: {response.status_code}")
+                timeout=30,  # уменьшаем таймаут для быстрых моделей
+                stream=True
+            ) as response:
+                self.logger.debug(f"Получен ответ: {response.status_code}")
+                
+                if response.status_code != 200:
+                    self.logger.error(f"Ошибка API: {response.status_code}")
+                    return None
+                
+                body = []
+                for chunk in response.iter_content(chunk_size=4096):
+                    if cancelled is not None and cancelled.is_set():
+                        self.logger.debug("Запрос прерван")
+                        return None
+                    body.append(chunk)
             
-            if response.status_code == 200:
-                try:
-                    data = response.json()
-                    self.logger.debug(f"Тело ответа: {data}")
+            try:
+                data = json.loads(b''.join(body))
+                self.logger.debug(f"Тело ответа: {data}")
+                
+                if 'choices' in data and len(data['choices']) > 0:
+                    content = data['choices'][0]['message']['content']
+                    self.logger.debug(f"Содержимое ответа: {content}")
                     
-                    if 'choices' in data and len(data['choices']) > 0:
-                        content = data['choices'][0]['message']['content']
-                        self.logger.debug(f"Содержимое ответа: {content}")
-                        
-                        # Извлекаем JSON из ответа
-                        import re
-                        json_match = re.search(r'```json\n(.*?)\n```', content, re.DOTALL)
-                        if json_match:
-                            json_str = json_match.group(1)
-                            return json.loads(json_str)
-                        else:
-                            # Пробуем распарсить весь ответ как JSON
-                            try:
-                                return json.loads(content)
-                            except:
-                                self.logger.warning("Не удалось распарсить JSON")
-                                return None
-                except Exception as e:
-                    self.logger.error(f"Ошибка обработки ответа: {str(e)}")
-                    return None
-            else:
-                self.logger.error(f"Ошибка API: {response.status_code}")
+                    # Извлекаем JSON из ответа
+                    return self._parse_content(content)
+            except Exception as e:
+                self.logger.error(f"Ошибка обработки ответа: {str(e)}")
                 return None
                 
         except Exception as e:
             self.logger.error(f"Ошибка запроса: {str(e)}")
             return None
     
+    def stream_request(self, prompt: str, on_action: Callable[[Dict], None],
+                       cancelled: Optional[threading.Event] = None,
+                       backend: Optional[Backend] = None) -> Optional[Dict]:
+        """Потоковый запрос (SSE): каждое действие передаётся в on_action,
+        как только его объект закрылся в тексте ответа.
+
+        Возвращает весь разобранный ответ (или None, если его не удалось разобрать).
+        """
+        backend = backend or self.pool.primary
+        try:
+            self.logger.debug(f"Потоковый запрос к {backend.api_type}")
+            headers, payload = self._build_request(prompt, stream=True, backend=backend)
+            
+            with self.session.post(backend.api_url, json=payload, headers=headers,
+                                   timeout=30, stream=True) as response:
+                self.logger.debug(f"Получен ответ: {response.status_code}")
+                if response.status_code != 200:
+                    self.logger.error(f"Ошибка API: {response.status_code}")
+                    return None
+                
+                response.encoding = 'utf-8'
+                parser = ActionStreamParser()
+                for content in iter_sse_content(response.iter_lines(decode_unicode=True)):
+                    if cancelled is not None and cancelled.is_set():
+                        self.logger.debug("Потоковый запрос прерван")
+                        return None
+                    for action in parser.feed(content):
+                        if self._validate_action(action):
+                            on_action(action)
+            
+            self.logger.debug(f"Содержимое ответа: {parser.text}")
+            return self._parse_content(parser.text)
+        
+        except Exception as e:
+            self.logger.error(f"Ошибка запроса: {str(e)}")
+            return None
+    
     def interpret_response(self, response: Dict) -> List[Dict]:
         """Интерпретация ответа от ИИ"""
         try:
@@ -0,0 +1,141 @@
+import os
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, List, Optional
+import numpy as np
+
+
+@dataclass
+class Backend:
+    """Один API с интерфейсом chat/completions"""
+    api_type: str  # openrouter, lmstudio или vercel
+    api_url: str
+    model: str
+    api_key: Optional[str] = None
+
+
+def backend_from_env(api_type: str) -> Backend:
+    """Настройки API по его типу (ключи берутся из переменных окружения)"""
+    if api_type == 'openrouter':
+        # Получаем API ключ из переменной окружения или используем резервный ключ
+        return Backend(
+            api_type,
+            "https://openrouter.ai/api/v1/chat/completions",
+            "google/gemini-2.0-pro-exp-02-05:free",  # или другая быстрая модель
+            os.getenv('OPENROUTER_API_KEY',
+                      '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')
+        )
+    elif api_type == 'lmstudio':
+        return Backend(api_type, os.getenv('LMSTUDIO_URL', "http://localhost:1234/v1/chat/completions"),
+                       "local-model")
+    elif api_type == 'vercel':
+        return Backend(api_type, "https://api.vercel.ai/v1/chat/completions", "gemini-pro",
+                       os.getenv('VERCEL_AI_API_KEY'))
+    raise ValueError(f"Неизвестный тип API: {api_type}")
+
+
+@dataclass
+class BackendStats:
+    """Задержки ответов и число ошибок одного API"""
+    latencies: Deque[float] = field(default_factory=lambda: deque(maxlen=50))
+    successes: int = 0
+    errors: int = 0
+    # Запросы, обогнанные дублирующим запросом к другому API
+    timeouts: int = 0
+    # Результаты последних запросов (True - успех) для оценки текущей надёжности
+    recent: Deque[bool] = field(default_factory=lambda: deque(maxlen=20))
+
+    @property
+    def error_rate(self) -> float:
+        return 1 - sum(self.recent) / len(self.recent) if self.recent else 0.0
+
+
+class BackendPool:
+    """Набор API с учётом задержек и ошибок каждого.
+
+    Порядок опроса - порядок настройки, но API, у которого больше половины
+    последних запросов (но не меньше min_samples) завершились ошибкой,
+    уходит в конец. Порог
+    дублирования запроса - 90-й перцентиль задержек основного API.
+    """
+
+    def __init__(self, backends: List[Backend], default_hedge_delay: float = 8.0,
+                 min_samples: int = 5):
+        if not backends:
+            raise ValueError("Нужен хотя бы один API")
+        self.backends = backends
+        self.default_hedge_delay = default_hedge_delay
+        self.min_samples = min_samples
+        self.stats: Dict[int, BackendStats] = {id(backend): BackendStats() for backend in backends}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> 'BackendPool':
+        """Пул из AI_BACKENDS (через запятую) или из одного AI_API_TYPE"""
+        names = os.getenv('AI_BACKENDS') or os.getenv('AI_API_TYPE', 'openrouter')
+        backends = [backend_from_env(name.strip()) for name in names.split(',') if name.strip()]
+        return cls(backends, default_hedge_delay=float(os.getenv('AI_HEDGE_DELAY', '8')))
+
+    @property
+    def primary(self) -> Backend:
+        return self.backends[0]
+
+    def ordered(self) -> List[Backend]:
+        """API в порядке опроса"""
+        with self._lock:
+            return sorted(self.backends, key=self._demoted)
+
+    def _demoted(self, backend: Backend) -> bool:
+        # Единичный проигрыш не должен сразу отправлять API в конец очереди
+        stats = self.stats[id(backend)]
+        return len(stats.recent) >= self.min_samples and stats.error_rate > 0.5
+
+    def record(self, backend: Backend, latency: float, ok: bool):
+        """Учёт результата запроса"""
+        with self._lock:
+            stats = self.stats[id(backend)]
+            stats.recent.append(ok)
+            if ok:
+                stats.successes += 1
+                stats.latencies.append(latency)
+            else:
+                stats.errors += 1
+
+    def record_timeout(self, backend: Backend, elapsed: float):
+        """Учёт запроса, прерванного из-за того, что другой API ответил раньше.
+
+        Время ожидания добавляется в задержки как нижняя оценка, а сам запрос
+        считается неудачным, поэтому медленный API поднимает свой p90 и при
+        постоянных проигрышах уходит в конец очереди.
+        """
+        with self._lock:
+            stats = self.stats[id(backend)]
+            stats.recent.append(False)
+            stats.timeouts += 1
+            stats.latencies.append(elapsed)
+
+    def hedge_delay(self, backend: Backend) -> float:
+        """Сколько ждать ответа backend перед отправкой запроса следующему API"""
+        with self._lock:
+            latencies = self.stats[id(backend)].latencies
+            if len(latencies) < self.min_samples:
+                return self.default_hedge_delay
+            return float(np.percentile(latencies, 90))
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Сводка по API: число ответов, ошибок и обгонов, медиана и p90 задержки"""
+        with self._lock:
+            result = {}
+            for backend in self.backends:
+                stats = self.stats[id(backend)]
+                latencies = list(stats.latencies)
+                result[f"{backend.api_type} {backend.api_url}"] = {
+                    'successes': stats.successes,
+                    'errors': stats.errors,
+                    'timeouts': stats.timeouts,
+                    'error_rate': stats.error_rate,
+                    'p50': float(np.percentile(latencies, 50)) if latencies else None,
+                    'p90': float(np.percentile(latencies, 90)) if latencies else None,
+                }
+            return result
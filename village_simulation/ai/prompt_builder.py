@@ -0,0 +1,158 @@
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+import numpy as np
+
+# Метрики, распределение которых по жителям попадает в промпт
+DISTRIBUTION_COLUMNS = ('wealth', 'happiness')
+
+# Относительное изменение выводится, только если начальное значение по модулю
+# больше TREND_EPS и TREND_RELATIVE_EPS от наибольшего значения окна; иначе
+# процент от почти нуля бессмыслен и остаётся только абсолютная разница
+TREND_EPS = 1e-6
+TREND_RELATIVE_EPS = 0.05
+
+# Подписи метрик истории (ключи VillageGame.stats_history)
+TREND_LABELS = {
+    'happiness': 'счастье',
+    'wealth': 'богатство',
+    'population': 'население',
+    'food': 'еда',
+    'tools': 'инструменты',
+    'materials': 'материалы',
+}
+
+
+def estimate_tokens(text: str) -> int:
+    """Грубая оценка числа токенов (для русского текста с цифрами ~3 символа на токен)"""
+    return len(text) // 3 + 1
+
+
+def format_number(value: float) -> str:
+    """Короткая запись числа: 0.52, 87, 12.3k, 4.1M"""
+    value = float(value)
+    magnitude = abs(value)
+    if magnitude >= 1e6:
+        return f"{value / 1e6:.1f}M"
+    if magnitude >= 1e4:
+        return f"{value / 1e3:.1f}k"
+    if magnitude >= 100 or value == int(value):
+        return f"{value:.0f}"
+    return f"{value:.2f}"
+
+
+def summarize_distribution(values: np.ndarray,
+                           percentiles: Sequence[int] = (10, 50, 90)) -> Dict[str, float]:
+    """Перцентили и среднее значения по всем жителям"""
+    values = np.asarray(values, dtype=np.float64)
+    if not len(values):
+        return {}
+    summary = {f"p{p}": float(v) for p, v in zip(percentiles, np.percentile(values, percentiles))}
+    summary['mean'] = float(values.mean())
+    return summary
+
+
+def model_distributions(model, percentiles: Sequence[int] = (10, 50, 90)) -> Dict[str, Dict[str, float]]:
+    """Распределения DISTRIBUTION_COLUMNS по жителям модели (из массивов AgentState)"""
+    state = model.agent_state
+    return {
+        column: summarize_distribution(getattr(state, column)[:state.size], percentiles)
+        for column in DISTRIBUTION_COLUMNS
+    }
+
+
+class PromptBuilder:
+    """Сжатое описание состояния деревни для ИИ-советника.
+
+    Вместо сырых словарей и данных по жителям промпт содержит сводку
+    get_statistics(), перцентили распределений богатства и счастья и
+    изменения метрик за последние trend_window точек истории. Строки
+    добавляются по убыванию важности, пока укладываются в token_budget,
+    поэтому размер промпта не зависит от числа жителей и длины истории.
+    """
+
+    def __init__(self, token_budget: int = 400, percentiles: Sequence[int] = (10, 50, 90),
+                 trend_window: int = 30):
+        self.token_budget = token_budget
+        self.percentiles = tuple(percentiles)
+        self.trend_window = trend_window
+
+    def build(self, statistics: Mapping[str, Any],
+              distributions: Optional[Mapping[str, Mapping[str, float]]] = None,
+              history: Optional[Mapping[str, Any]] = None) -> str:
+        """Промпт из статистики модели, распределений и истории метрик"""
+        # (важность, порядок вывода, строка); 0 - выводится всегда
+        lines: List[Tuple[int, int, str]] = []
+
+        def add(priority: int, text: str):
+            lines.append((priority, len(lines), text))
+
+        date = statistics.get('date')
+        header = f"Дата: {date:%Y-%m-%d}" if hasattr(date, 'strftime') else "Состояние деревни"
+        add(0, f"{header}. Население: {statistics.get('population', 0)}")
+
+        economy = statistics.get('economy', {})
+        social = statistics.get('social_metrics', {})
+        if 'total_wealth' in economy:
+            add(1, f"Богатство всего: {format_number(economy['total_wealth'])}")
+        if 'average_happiness' in social:
+            add(1, f"Среднее счастье: {format_number(social['average_happiness'])}")
+        resources = economy.get('resources', {})
+        if resources:
+            add(2, "Ресурсы: " + ", ".join(f"{name} {format_number(value)}"
+                                          for name, value in resources.items()))
+
+        for column, summary in (distributions or {}).items():
+            if summary:
+                label = TREND_LABELS.get(column, column)
+                parts = ", ".join(f"{key} {format_number(value)}" for key, value in summary.items())
+                add(3, f"Распределение ({label}): {parts}")
+
+        for name, values in self._trend_series(history or {}):
+            trend = self._trend(values)
+            if trend:
+                add(4, f"Тренд ({TREND_LABELS.get(name, name)}, {len(values)} точек): {trend}")
+
+        events = {name: value for name, value in social.items()
+                  if name != 'average_happiness' and value}
+        if events:
+            add(5, "События: " + ", ".join(f"{name} {format_number(value)}"
+                                          for name, value in events.items()))
+
+        instruction = "Предложи действия для улучшения ситуации."
+        return self._fit(lines, instruction)
+
+    def _trend_series(self, history: Mapping[str, Any]) -> List[Tuple[str, np.ndarray]]:
+        """Последние trend_window значений каждой метрики истории"""
+        series = []
+        for name, values in history.items():
+            if isinstance(values, Mapping):
+                series.extend(self._trend_series(values))
+                continue
+            if hasattr(values, 'recent'):
+                recent = values.recent(self.trend_window)
+            else:
+                recent = np.asarray(values[-self.trend_window:], dtype=np.float64)
+            if len(recent) >= 2:
+                series.append((name, recent))
+        return series
+
+    @staticmethod
+    def _trend(values: np.ndarray) -> str:
+        """Изменение метрики за окно: абсолютное, относительное, размах"""
+        first, last = float(values[0]), float(values[-1])
+        delta = last - first
+        text = f"{format_number(first)} -> {format_number(last)} ({'+' if delta >= 0 else ''}{format_number(delta)}"
+        scale = float(np.abs(values).max())
+        if abs(first) > max(TREND_EPS, TREND_RELATIVE_EPS * scale):
+            text += f", {delta / abs(first) * 100:+.0f}%"
+        return text + f"), мин {format_number(values.min())}, макс {format_number(values.max())}"
+
+    def _fit(self, lines: List[Tuple[int, int, str]], instruction: str) -> str:
+        """Отбор строк по важности в пределах бюджета токенов"""
+        budget = self.token_budget - estimate_tokens(instruction)
+        kept = []
+        for priority, order, text in sorted(lines):
+            cost = estimate_tokens(text)
+            if priority == 0 or cost <= budget:
+                kept.append((order, text))
+                budget -= cost
+        return "\n".join([text for _, text in sorted(kept)] + [instruction])
@@ -0,0 +1,155 @@
+import hashlib
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections.abc import Mapping
+from typing import Any, Dict, List, Optional, Tuple
+
+
+def quantize(value: float, relative_step: float = 0.1, absolute_step: float = 0.05) -> int:
+    """Номер корзины для значения метрики.
+
+    Значения в пределах [-1, 1] (доли, счастье) делятся на корзины шириной
+    absolute_step, большие (богатство, ресурсы) - на логарифмические корзины,
+    соседние границы которых отличаются на relative_step.
+    """
+    if math.isnan(value):
+        return 0
+    if abs(value) <= 1:
+        return int(round(value / absolute_step))
+    bucket = int(math.log(abs(value)) / math.log1p(relative_step)) + int(round(1 / absolute_step)) + 1
+    return bucket if value > 0 else -bucket
+
+
+def state_fingerprint(statistics: Dict[str, Any], relative_step: float = 0.1,
+                      absolute_step: float = 0.05) -> List[Tuple[str, int]]:
+    """Квантованный отпечаток статистики модели (get_statistics()).
+
+    Учитываются только числовые значения (дата и строки пропускаются),
+    поэтому почти одинаковые состояния дают одинаковый отпечаток.
+    """
+    fingerprint = []
+
+    def walk(prefix: str, value: Any):
+        if isinstance(value, Mapping):
+            for key in sorted(value, key=str):
+                walk(f"{prefix}.{key}" if prefix else str(key), value[key])
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            fingerprint.append((prefix, quantize(float(value), relative_step, absolute_step)))
+
+    walk('', statistics)
+    return fingerprint
+
+
+class ResponseCache:
+    """Дисковый кэш ответов ИИ-советника с TTL и вытеснением давно не использованных (LRU).
+
+    Ключ - системный промпт, модель и квантованный отпечаток состояния деревни.
+    Хранится в SQLite, доступ из нескольких потоков защищён блокировкой.
+    """
+
+    def __init__(self, path: str, ttl: float = 1800.0, max_entries: int = 500,
+                 relative_step: float = 0.1, absolute_step: float = 0.05):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.relative_step = relative_step
+        self.absolute_step = absolute_step
+        self.hits = 0
+        self.misses = 0
+        # Время последнего попадания по ключам; в базу пишется вместе с put()
+        self._touched: Dict[str, float] = {}
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, response TEXT NOT NULL,"
+            " created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._db.commit()
+
+    def key(self, system_prompt: str, model: str, statistics: Dict[str, Any]) -> str:
+        """Ключ кэша для состояния деревни"""
+        fingerprint = state_fingerprint(statistics, self.relative_step, self.absolute_step)
+        payload = json.dumps([system_prompt, model, fingerprint], ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Ответ из кэша; None при промахе или если запись устарела"""
+        response = self.peek(key)
+        self.count_lookup(response is not None)
+        return response
+
+    def peek(self, key: str) -> Optional[Dict]:
+        """То же, что get(), но без учёта в счётчиках попаданий и промахов.
+
+        Только чтение: устаревшие записи удаляются, а время доступа
+        записывается при следующем put(), чтобы проверка кэша в игровом
+        цикле не ждала записи на диск.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT response, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                return None
+            self._touched[key] = now
+        return json.loads(row[0])
+
+    def count_lookup(self, hit: bool):
+        """Учёт одного обращения к кэшу, проверившего один или несколько ключей"""
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def put(self, key: str, response: Dict):
+        """Сохранение ответа с вытеснением устаревших и лишних записей"""
+        now = time.time()
+        with self._lock:
+            self._flush_touched()
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, response, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(response, ensure_ascii=False), now, now)
+            )
+            self._db.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+            self._db.execute(
+                "DELETE FROM responses WHERE key NOT IN "
+                "(SELECT key FROM responses ORDER BY accessed DESC LIMIT ?)",
+                (self.max_entries,)
+            )
+            self._db.commit()
+
+    def stats(self) -> Dict[str, float]:
+        """Счётчики попаданий и промахов для подбора размера корзин"""
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'entries': entries,
+        }
+
+    def _flush_touched(self):
+        """Запись накопленных времён доступа (вызывается под блокировкой)"""
+        if self._touched:
+            self._db.executemany("UPDATE responses SET accessed = ? WHERE key = ?",
+                                 [(accessed, key) for key, accessed in self._touched.items()])
+            self._touched.clear()
+
+    def close(self):
+        with self._lock:
+            self._flush_touched()
+            self._db.commit()
+            self._db.close()
@@ -0,0 +1,101 @@
+import json
+from typing import Dict, Iterable, Iterator, List, Optional
+
+
+def iter_sse_content(lines: Iterable[str]) -> Iterator[str]:
+    """Фрагменты текста из потока SSE в формате OpenAI (chat.completion.chunk)"""
+    for line in lines:
+        if not line or not line.startswith('data:'):
+            continue
+        data = line[len('data:'):].strip()
+        if data == '[DONE]':
+            break
+        try:
+            chunk = json.loads(data)
+        except json.JSONDecodeError:
+            continue
+        for choice in chunk.get('choices', []):
+            content = (choice.get('delta') or {}).get('content')
+            if content:
+                yield content
+
+
+class ActionStreamParser:
+    """Пошаговый разбор массива "actions" по мере поступления текста.
+
+    feed() возвращает действия, объект которых закрылся в очередном
+    фрагменте; остальной текст ответа накапливается в text.
+    """
+
+    def __init__(self):
+        self.text = ''
+        self._pos = 0
+        self._state = 'seek'  # seek -> array -> object -> array ... -> done
+        self._depth = 0
+        self._start = 0
+        # Строки JSON отслеживаются с первого символа, чтобы "actions": [
+        # внутри строки (например, в analysis) не принималось за начало массива
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        # Разбор ключа в режиме seek: последняя закрытая строка и что ожидается за ней
+        self._key: Optional[str] = None
+        self._expect: Optional[str] = None  # colon -> array
+
+    @property
+    def done(self) -> bool:
+        return self._state == 'done'
+
+    def feed(self, chunk: str) -> List[Dict]:
+        self.text += chunk
+        actions = []
+        text = self.text
+
+        while self._pos < len(text) and self._state != 'done':
+            char = text[self._pos]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._state == 'seek':
+                        self._key = text[self._string_start + 1:self._pos]
+                        self._expect = 'colon'
+            elif char == '"':
+                self._in_string = True
+                self._string_start = self._pos
+            elif self._state == 'seek':
+                self._seek(char)
+            elif self._state == 'array':
+                if char == '{':
+                    self._state = 'object'
+                    self._start = self._pos
+                    self._depth = 1
+                elif char == ']':
+                    self._state = 'done'
+            elif char == '{':
+                self._depth += 1
+            elif char == '}':
+                self._depth -= 1
+                if self._depth == 0:
+                    self._state = 'array'
+                    try:
+                        actions.append(json.loads(text[self._start:self._pos + 1]))
+                    except json.JSONDecodeError:
+                        pass
+            self._pos += 1
+        return actions
+
+    def _seek(self, char: str):
+        """Поиск ключа "actions", за которым идут двоеточие и начало массива"""
+        if char.isspace():
+            return
+        if char == ':' and self._expect == 'colon' and self._key == 'actions':
+            self._expect = 'array'
+        elif char == '[' and self._expect == 'array':
+            self._state = 'array'
+            self._expect = None
+        else:
+            self._expect = None
@@ -0,0 +1,115 @@
+"""
+Локальный сервер-заглушка с API в формате OpenAI (chat/completions).
+
+Отдаёт заранее заданный ответ советника целиком или потоком SSE с паузой
+между фрагментами; нужен для проверки AIController без внешних сервисов.
+
+Запуск:
+    python -m village_simulation.ai.stub_server --port 1234 --chunk-delay 0.05
+
+После этого в .env: AI_API_TYPE=lmstudio (адрес http://localhost:1234).
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+# Ответ по умолчанию: анализ и несколько действий
+DEFAULT_RESPONSE = {
+    "analysis": "Запасы еды снижаются, часть жителей без работы.",
+    "actions": [
+        {"type": "CREATE_JOBS", "target": "farm", "value": 10, "priority": 1},
+        {"type": "DISTRIBUTE_RESOURCES", "target": "food", "value": 200, "priority": 2},
+        {"type": "ORGANIZE_EVENT", "target": "праздник урожая", "value": "осень", "priority": 4}
+    ]
+}
+
+
+def split_chunks(text: str, size: int) -> List[str]:
+    """Разбиение текста на фрагменты, как модель отдаёт токены"""
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    response_text = json.dumps(DEFAULT_RESPONSE, ensure_ascii=False)
+    chunk_size = 8
+    chunk_delay = 0.05
+    latency = 0.0
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        request = json.loads(self.rfile.read(length) or b'{}')
+        time.sleep(self.latency)
+
+        if request.get('stream'):
+            self._send_stream()
+        else:
+            body = json.dumps({
+                "object": "chat.completion",
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": self.response_text}}]
+            }).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    def _send_stream(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.end_headers()
+        try:
+            for chunk in split_chunks(self.response_text, self.chunk_size):
+                event = {
+                    "object": "chat.completion.chunk",
+                    "choices": [{"index": 0, "delta": {"content": chunk}}]
+                }
+                self.wfile.write(f"data: {json.dumps(event)}\n\n".encode('utf-8'))
+                self.wfile.flush()
+                time.sleep(self.chunk_delay)
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # Клиент прервал поток (например, отменённый дублирующий запрос)
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_server(port: int = 0, response: Optional[Dict] = None, chunk_size: int = 8,
+                      chunk_delay: float = 0.05, latency: float = 0.0) -> ThreadingHTTPServer:
+    """Запуск сервера в фоновом потоке; адрес - http://127.0.0.1:{server.server_port}"""
+    handler = type('ConfiguredStubHandler', (StubHandler,), {
+        'response_text': json.dumps(response or DEFAULT_RESPONSE, ensure_ascii=False),
+        'chunk_size': chunk_size,
+        'chunk_delay': chunk_delay,
+        'latency': latency,
+    })
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сервер-заглушка API советника")
+    parser.add_argument('--port', type=int, default=1234)
+    parser.add_argument('--chunk-size', type=int, default=8)
+    parser.add_argument('--chunk-delay', type=float, default=0.05)
+    parser.add_argument('--latency', type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = start_stub_server(args.port, chunk_size=args.chunk_size,
+                               chunk_delay=args.chunk_delay, latency=args.latency)
+    print(f"Заглушка API: http://127.0.0.1:{server.server_port}/v1/chat/completions")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
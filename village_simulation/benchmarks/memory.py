@@ -0,0 +1,106 @@
+"""
+Бенчмарк памяти на одного жителя.
+
+Сравнивает прежнее представление (атрибуты в __dict__, три dataclass-объекта
+и словарь ресурсов на каждого жителя) с текущим, где признаки и состояние
+лежат в массивах AgentState, а VillageResident - представление строки.
+В обоих случаях учитываются узлы графа, регистрация агента в Mesa и пустое
+хранилище связей (списки у прежнего жителя, Relations у текущего).
+
+Запуск:
+    python -m village_simulation.benchmarks.memory --agents 100000
+"""
+import argparse
+import gc
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+import numpy as np
+from mesa import Agent
+
+from village_simulation.src.agent import Demographics, Personality, Skills
+from village_simulation.src.agent_state import AgentState
+from village_simulation.src.social import Relations
+from village_simulation.src.village_model import VillageModel
+
+
+class LegacyResident(Agent):
+    """Прежняя раскладка VillageResident (для сравнения)"""
+
+    def __init__(self, unique_id, model, demographics, personality, skills):
+        super().__init__(unique_id, model)
+        self.demographics = demographics
+        self.personality = personality
+        self.skills = skills
+        self.family: List[int] = []
+        self.friends: List[int] = []
+        self.colleagues: List[int] = []
+        self.neighbors: List[int] = []
+        self.wealth: float = 0.0
+        self.income: float = 0.0
+        self.job: Optional[str] = None
+        self.owned_resources: Dict[str, float] = {}
+        self.health: float = 1.0
+        self.happiness: float = 0.5
+        self.energy: float = 1.0
+
+
+def _empty_model(num_agents: int) -> VillageModel:
+    """Модель без жителей, рассчитанная на num_agents"""
+    model = VillageModel(num_agents=0, seed=0)
+    model.num_agents = num_agents
+    return model
+
+
+def build_legacy(model: VillageModel):
+    n = model.num_agents
+    ages = np.clip(np.random.normal(30, 15, n).astype(int), 0, 90).tolist()
+    traits = np.random.beta(2, 2, (8, n)).tolist()
+    model.village_agents = [
+        LegacyResident(
+            i, model,
+            Demographics(ages[i], 'M', 'single', 'basic'),
+            Personality(*(column[i] for column in traits[:4])),
+            Skills(*(column[i] for column in traits[4:]))
+        )
+        for i in range(n)
+    ]
+    model.G.add_nodes_from(range(n))
+
+
+def build_current(model: VillageModel):
+    # Столбцы AgentState и пустые индексы связей (аналог четырёх пустых списков
+    # у прежнего жителя) выделяются внутри замера, иначе они не попадут в итог
+    model.agent_state = AgentState(model.num_agents)
+    model.relations = Relations(model.num_agents)
+    model._create_initial_population()
+
+
+def bytes_per_agent(build: Callable[[VillageModel], None], num_agents: int) -> float:
+    """Прирост удерживаемой памяти на одного жителя"""
+    model = _empty_model(num_agents)
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    build(model)
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / num_agents
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--agents', type=int, default=100000)
+    args = parser.parse_args()
+
+    np.random.seed(0)
+    legacy = bytes_per_agent(build_legacy, args.agents)
+    current = bytes_per_agent(build_current, args.agents)
+    print(f"Жителей: {args.agents}")
+    print(f"До (dict + dataclass):   {legacy:8.0f} байт/житель")
+    print(f"После (массивы AgentState): {current:8.0f} байт/житель")
+    print(f"Экономия: {legacy / current:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Бенчмарк построения начальной социальной сети.
+
+Запуск:
+    python -m village_simulation.benchmarks.social_graph --sizes 1000,10000,100000
+
+Для каждого размера замеряются два режима:
+- dense - исходная вероятность связи 0.1-0.3. Число рёбер растёт как N^2,
+  поэтому размеры, для которых ожидаемое число связей превышает --max-edges,
+  пропускаются.
+- sparse - фиксированное среднее число связей жителя (--expected-degree,
+  см. VillageModel.expected_degree). Выполняется для всех размеров.
+"""
+import argparse
+import time
+from typing import Optional
+import numpy as np
+
+from village_simulation.src.agent_state import AgentState
+from village_simulation.src.social import Relations, sample_initial_links
+from village_simulation.src.village_model import VillageModel
+
+
+def connection_probability(num_agents: int, expected_degree: Optional[float] = None) -> np.ndarray:
+    """Вероятности связи, как в VillageModel._establish_initial_relationships"""
+    probability = 0.1 + np.random.beta(2, 2, num_agents) * 0.2
+    if expected_degree is not None:
+        probability *= expected_degree / (probability.mean() * (num_agents - 1))
+    return np.minimum(1.0, probability)
+
+
+def bench_sampler(num_agents: int, expected_degree: Optional[float] = None) -> float:
+    """Время выборки связей без заполнения графа"""
+    probability = connection_probability(num_agents, expected_degree)
+    start = time.perf_counter()
+    sample_initial_links(probability)
+    return time.perf_counter() - start
+
+
+def bench_model(num_agents: int, expected_degree: Optional[float] = None) -> float:
+    """Время _establish_initial_relationships с заполнением графа и индексов связей"""
+    # Конструктор с num_agents сразу строит сеть, поэтому модель создаётся
+    # пустой и заселяется без связей - сеть строится один раз, под замером
+    model = VillageModel(num_agents=0, seed=0, expected_degree=expected_degree)
+    model.num_agents = num_agents
+    model.agent_state = AgentState(num_agents)
+    model.relations = Relations(num_agents)
+    model._create_initial_population()
+    start = time.perf_counter()
+    model._establish_initial_relationships()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', default='1000,2000,5000,10000,20000,50000,100000')
+    parser.add_argument('--expected-degree', type=float, default=50,
+                        help='среднее число связей жителя в режиме sparse')
+    parser.add_argument('--max-edges', type=float, default=5e7,
+                        help='максимум ожидаемых связей для выборки в режиме dense')
+    parser.add_argument('--max-graph-edges', type=float, default=1e7,
+                        help='максимум ожидаемых связей для полной сборки графа')
+    args = parser.parse_args()
+
+    np.random.seed(0)
+    print(f"{'agents':>8} {'mode':>7} {'edges':>12} {'sampler, s':>12} {'model, s':>12}")
+    for num_agents in (int(size) for size in args.sizes.split(',')):
+        # Средняя вероятность связи 0.2 (социальность ~ Beta(2, 2))
+        modes = (
+            ('dense', None, 0.2 * num_agents * (num_agents - 1)),
+            ('sparse', args.expected_degree, args.expected_degree * num_agents),
+        )
+        for mode, expected_degree, expected_edges in modes:
+            if expected_edges > args.max_edges:
+                print(f"{num_agents:>8} {mode:>7} {expected_edges:>12.3g} {'skipped':>12} {'skipped':>12}")
+                continue
+            sampler_time = bench_sampler(num_agents, expected_degree)
+            model_time = (f"{bench_model(num_agents, expected_degree):>12.3f}"
+                          if expected_edges <= args.max_graph_edges else f"{'skipped':>12}")
+            print(f"{num_agents:>8} {mode:>7} {expected_edges:>12.3g} {sampler_time:>12.3f} {model_time}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 import pygame
+import numpy as np
 import sys
 import logging
 from datetime import datetime
@@ -6,8 +7,14 @@ from typing import Dict, List, Tuple, Optional
 from dataclasses import dataclass
 import random
 import os
+from collections import Counter, OrderedDict
+from concurrent.futures import Future
 from village_simulation.src.village_model import VillageModel
 from village_simulation.game.villager_sprite import VillagerSprite
+from village_simulation.game.spatial_hash import SpatialHash
+from village_simulation.game.sprite_manager import SpriteManager
+from village_simulation.game.simulation_worker import SimulationWorker
+from village_simulation.game.stats_history import MetricHistory
 from village_simulation.ai.ai_controller import AIController
 from dotenv import load_dotenv
 
@@ -19,6 +26,7 @@ GRID_WIDTH = 100
 GRID_HEIGHT = 80
 CAMERA_EDGE_SIZE = 20  # Размер области у края экрана для движения камеры
 CAMERA_SPEED = 10  # Скорость движения камеры
+MAX_GAME_SPEED = 128  # Максимальное ускорение времени
 
 # Новые константы интерфейса
 UI = {
@@ -57,6 +65,49 @@ TILES = {
     'HOUSE': 4
 }
 
+# Цвета тайлов
+TILE_COLORS = {
+    TILES['GRASS']: COLORS['GREEN'],
+    TILES['WATER']: COLORS['BLUE'],
+    TILES['PATH']: COLORS['YELLOW'],
+    TILES['FARM']: COLORS['ORANGE'],
+    TILES['HOUSE']: COLORS['RED']
+}
+
+# Палитра для векторного перевода типов тайлов в RGB (неизвестные - серые)
+TILE_PALETTE = np.full((256, 3), COLORS['GRAY'], dtype=np.uint8)
+for _tile_type, _color in TILE_COLORS.items():
+    TILE_PALETTE[_tile_type] = _color
+
+class TextCache:
+    """LRU-кэш отрендеренных надписей по ключу (шрифт, текст, цвет)"""
+    
+    def __init__(self, max_size: int = 512):
+        self.max_size = max_size
+        self._surfaces: "OrderedDict[Tuple, pygame.Surface]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+    
+    def render(self, font: pygame.font.Font, text: str, color: Tuple[int, ...]) -> pygame.Surface:
+        key = (font, text, tuple(color))
+        surface = self._surfaces.get(key)
+        if surface is not None:
+            self._surfaces.move_to_end(key)
+            self.hits += 1
+            return surface
+        self.misses += 1
+        surface = font.render(text, True, color)
+        self._surfaces[key] = surface
+        if len(self._surfaces) > self.max_size:
+            self._surfaces.popitem(last=False)
+        return surface
+    
+    def clear(self):
+        self._surfaces.clear()
+
+# Общий кэш надписей интерфейса (кнопки, панели, подсказки)
+TEXT_CACHE = TextCache()
+
 @dataclass
 class GameObject:
     type: str
@@ -87,13 +138,13 @@ class ModernButton:
         
         # Отрисовка иконки и текста
         content = f"{self.icon} {self.text}" if self.icon else self.text
-        text_surface = font.render(content, True, COLORS['TEXT'])
+        text_surface = TEXT_CACHE.render(font, content, COLORS['TEXT'])
         text_rect = text_surface.get_rect(center=self.rect.center)
         screen.blit(text_surface, text_rect)
     
         # Подсказка при наведении
         if self.hover and self.tooltip:
-            tooltip_surface = font.render(self.tooltip, True, COLORS['TEXT'])
+            tooltip_surface = TEXT_CACHE.render(font, self.tooltip, COLORS['TEXT'])
             tooltip_rect = tooltip_surface.get_rect(midtop=(self.rect.centerx, self.rect.bottom + 5))
             pygame.draw.rect(screen, COLORS['DARK_BLUE'], tooltip_rect.inflate(20, 10), border_radius=3)
             screen.blit(tooltip_surface, tooltip_rect)
@@ -111,7 +162,6 @@ class VillageGame:
         # Камера
         self.camera_x = 0
         self.camera_y = 0
-        self.world_surface = pygame.Surface((GRID_WIDTH * TILE_SIZE, GRID_HEIGHT * TILE_SIZE))
         
         # Инициализация модели
         self.model = VillageModel()
@@ -122,6 +172,10 @@ class VillageGame:
         self.model_update_interval = 1000  # Обновление модели каждую секунду
         self.paused = False  # Флаг паузы
         
+        # Модель продвигается в фоновом потоке; отрисовка читает только срезы
+        self.simulation = SimulationWorker(self.model, self._days_per_second())
+        self.snapshot = self.simulation.snapshot
+        
         # Обновленные кнопки
         button_y = WINDOW_HEIGHT - UI['PANEL_HEIGHT'] + 10
         self.buttons = {
@@ -143,28 +197,42 @@ class VillageGame:
         
         # Графики
         self.show_graphs = False
+        # История метрик фиксированного размера (кольцевые буферы с уровнями)
         self.stats_history = {
-            'happiness': [],
-            'wealth': [],
-            'population': [],
+            'happiness': MetricHistory(),
+            'wealth': MetricHistory(),
+            'population': MetricHistory(),
             'resources': {
-                'food': [],
-                'tools': [],
-                'materials': []
+                'food': MetricHistory(),
+                'tools': MetricHistory(),
+                'materials': MetricHistory()
             }
         }
         
         # Карта тайлов
-        self.tile_map = [[TILES['GRASS'] for _ in range(GRID_WIDTH)] for _ in range(GRID_HEIGHT)]
+        self.tile_map = np.full((GRID_HEIGHT, GRID_WIDTH), TILES['GRASS'], dtype=np.uint8)
+        # Кэш местности: один пиксель на тайл, масштабируется при выводе видимой области;
+        # тайлы перерисовываются только при изменении
+        self.terrain_layer = pygame.Surface((GRID_WIDTH, GRID_HEIGHT))
+        self.dirty_tiles = set()
+        self.terrain_ready = False
+        self.grid_overlay = self._create_grid_overlay()
+        # Кэш местности мини-карты
+        self.minimap_terrain: Optional[pygame.Surface] = None
+        self.minimap_dirty_tiles = set()
         self.communication_lines = []  # Линии коммуникаций между объектами
         
         # Игровые объекты
         self.objects: List[GameObject] = []
+        self.object_counts: Counter = Counter()  # Число объектов по типам
+        self.object_index = SpatialHash(TILE_SIZE * 2)
         self.selected_object: Optional[GameObject] = None
         
         # Жители
         self.villagers: List[VillagerSprite] = []
         self.selected_villager: Optional[VillagerSprite] = None
+        self.villager_index = SpatialHash(TILE_SIZE * 2, bounds=VillagerSprite.bounds)
+        self.sprite_manager = SpriteManager(len(self.model.village_agents))
         
         # Создание базовых объектов и жителей
         self._create_initial_map()
@@ -180,6 +248,12 @@ class VillageGame:
         self.running = True
         self.show_info = False
         
+        # Вывод на экран только изменившихся областей (display.update вместо flip)
+        self.dirty_rect_rendering = True
+        self.panel_cache: Dict[str, Tuple] = {}
+        self.world_dirty = True
+        self.last_drawn_camera: Optional[Tuple[int, int]] = None
+        
         # Таймер для обновления
         self.last_target_update = 0
         self.target_update_interval = 5000
@@ -196,13 +270,17 @@ class VillageGame:
         self.ai_last_request_time = 0
         self.ai_request_timeout = 30000  # 30 секунд таймаут
         self.ai_action_queue = []
+        # Ожидаемые распределения по жителям и статистика, для которой строится промпт
+        self.ai_distributions: Optional[Future] = None
+        self.ai_pending_statistics: Optional[Dict] = None
+        
+        # Загружаем конфигурацию из .env файла (до создания контроллера,
+        # который читает её при инициализации)
+        load_dotenv()
         
         # Инициализация AI контроллера
         self.ai_controller = AIController()
         
-        # Загружаем конфигурацию из .env файла
-        load_dotenv()
-        
         self.logger.info("ИИ инициализирован и активен")
     
     def setup_logging(self):
@@ -241,23 +319,83 @@ class VillageGame:
     
     def _create_initial_map(self):
         """Создание начальной карты с дорожками и различными типами местности"""
-        # Создание основных дорог
-        for x in range(GRID_WIDTH):
-            for y in range(GRID_HEIGHT):
-                # Главные дороги
-                if x % 10 == 0 or y % 10 == 0:
-                    self.tile_map[y][x] = TILES['PATH']
-                # Случайные участки воды
-                elif random.random() < 0.02:
-                    self.tile_map[y][x] = TILES['WATER']
-                # Случайные фермы
-                elif random.random() < 0.05:
-                    self.tile_map[y][x] = TILES['FARM']
-
+        xs = np.arange(GRID_WIDTH)[np.newaxis, :]
+        ys = np.arange(GRID_HEIGHT)[:, np.newaxis]
+        shape = (GRID_HEIGHT, GRID_WIDTH)
+        
+        # Главные дороги
+        roads = (xs % 10 == 0) | (ys % 10 == 0)
+        # Случайные участки воды
+        water = ~roads & (np.random.random(shape) < 0.02)
+        # Случайные фермы
+        farms = ~roads & ~water & (np.random.random(shape) < 0.05)
+        
+        self.tile_map[roads] = TILES['PATH']
+        self.tile_map[water] = TILES['WATER']
+        self.tile_map[farms] = TILES['FARM']
+    
+    def set_tile(self, x: int, y: int, tile_type: int):
+        """Изменение тайла карты (например, при строительстве)"""
+        if self.tile_map[y, x] != tile_type:
+            self.tile_map[y, x] = tile_type
+            self.dirty_tiles.add((x, y))
+            self.minimap_dirty_tiles.add((x, y))
+    
+    def _create_grid_overlay(self) -> pygame.Surface:
+        """Сетка границ тайлов размером с видимую область плюс один тайл"""
+        width = WINDOW_WIDTH - STATS_PANEL_WIDTH + TILE_SIZE
+        height = WINDOW_HEIGHT + TILE_SIZE
+        transparent = (255, 0, 255)
+        overlay = pygame.Surface((width, height))
+        overlay.fill(transparent)
+        overlay.set_colorkey(transparent)
+        
+        # Рамка в 1 пиксель по краям каждого тайла
+        pixels = pygame.surfarray.pixels3d(overlay)
+        for edge in (0, TILE_SIZE - 1):
+            pixels[edge::TILE_SIZE, :] = COLORS['BLACK']
+            pixels[:, edge::TILE_SIZE] = COLORS['BLACK']
+        del pixels
+        return overlay
+    
+    def _update_terrain_layer(self):
+        """Полная отрисовка кэша местности через палитру, далее - только изменённых тайлов"""
+        if not self.terrain_ready:
+            pygame.surfarray.blit_array(self.terrain_layer, TILE_PALETTE[self.tile_map.T])
+            self.terrain_ready = True
+        else:
+            for x, y in self.dirty_tiles:
+                self.terrain_layer.set_at((x, y), TILE_PALETTE[self.tile_map[y, x]].tolist())
+        self.dirty_tiles.clear()
+    
+    def _draw_terrain(self, view: pygame.Rect):
+        """Вывод видимой части местности: масштабирование кэша и сетка"""
+        left = view.left // TILE_SIZE
+        top = view.top // TILE_SIZE
+        right = min(GRID_WIDTH, -(-view.right // TILE_SIZE))
+        bottom = min(GRID_HEIGHT, -(-view.bottom // TILE_SIZE))
+        if right <= left or bottom <= top:
+            return
+        
+        visible = self.terrain_layer.subsurface((left, top, right - left, bottom - top))
+        scaled = pygame.transform.scale(visible, ((right - left) * TILE_SIZE, (bottom - top) * TILE_SIZE))
+        self.screen.blit(scaled, (left * TILE_SIZE - view.left, top * TILE_SIZE - view.top))
+        self.screen.blit(self.grid_overlay, (-(view.left % TILE_SIZE), -(view.top % TILE_SIZE)))
+    
+    def add_objects(self, objects: List[GameObject]):
+        """Добавление построенных объектов с обновлением счётчиков по типам"""
+        self.objects.extend(objects)
+        self.object_counts.update(obj.type for obj in objects)
+        for obj in objects:
+            self.object_index.insert(obj, pygame.Rect(
+                obj.position[0] * TILE_SIZE, obj.position[1] * TILE_SIZE,
+                obj.size[0] * TILE_SIZE, obj.size[1] * TILE_SIZE))
+        self.world_dirty = True
+    
     def _create_initial_objects(self):
         """Создание начальных объектов на карте"""
         # Примеры инфраструктуры
-        self.objects.extend([
+        self.add_objects([
             # Водонапорная башня
             GameObject(
                 type="water_tower",
@@ -303,8 +441,9 @@ class VillageGame:
             x = random.randint(0, WINDOW_WIDTH)
             y = random.randint(0, WINDOW_HEIGHT)
             
-            villager = VillagerSprite(agent, (x, y))
+            villager = VillagerSprite(agent, (x, y), self.sprite_manager)
             self.villagers.append(villager)
+        self.sprite_manager.attach_index(self.villager_index)
     
     def _create_communication_lines(self):
         """Создание линий коммуникаций между объектами"""
@@ -329,13 +468,18 @@ class VillageGame:
                 self.running = False
             
             elif event.type == pygame.MOUSEBUTTONDOWN:
-                mouse_pos = pygame.mouse.get_pos()
+                mouse_pos = event.pos
                 
                 # Обработка нажатий на кнопки
                 for name, button in self.buttons.items():
                     if button.rect.collidepoint(mouse_pos):
                         self._handle_button_click(name)
                         break
+                else:
+                    # Выбор жителя или объекта левой кнопкой в открытой части мира
+                    if event.button == 1 and self._world_viewport().collidepoint(mouse_pos):
+                        self._handle_click(mouse_pos)
+                        self.world_dirty = True
             
             elif event.type == pygame.MOUSEMOTION:
                 mouse_pos = pygame.mouse.get_pos()
@@ -383,8 +527,9 @@ class VillageGame:
         self.selected_villager = None
         self.show_info = False
         
-        # Проверка клика по жителям
-        for villager in self.villagers:
+        # Проверка клика по жителям (только рядом с точкой клика)
+        max_size = self.sprite_manager.max_size()
+        for villager in self.villager_index.query_radius(world_x, world_y, max_size):
             dx = world_x - villager.position[0]
             dy = world_y - villager.position[1]
             if (dx * dx + dy * dy) <= (villager.size * villager.size):
@@ -393,23 +538,17 @@ class VillageGame:
                 return
         
         # Проверка клика по объектам
-        grid_x = world_x // TILE_SIZE
-        grid_y = world_y // TILE_SIZE
-        
-        for obj in self.objects:
-            obj_rect = pygame.Rect(
-                obj.position[0] * TILE_SIZE,
-                obj.position[1] * TILE_SIZE,
-                obj.size[0] * TILE_SIZE,
-                obj.size[1] * TILE_SIZE
-            )
-            if obj_rect.collidepoint(world_x, world_y):
-                self.selected_object = obj
-                self.show_info = True
-                break
+        for obj in self.object_index.query_point(world_x, world_y):
+            self.selected_object = obj
+            self.show_info = True
+            break
     
     def draw(self):
         """Отрисовка игры"""
+        if self.dirty_rect_rendering:
+            self._draw_dirty_regions()
+            return
+        
         # Очистка экрана
         self.screen.fill(COLORS['BLACK'])
         
@@ -428,173 +567,273 @@ class VillageGame:
         
         pygame.display.flip()
     
+    def _draw_dirty_regions(self):
+        """Отрисовка только изменившихся областей экрана и вывод через display.update"""
+        world_rect = pygame.Rect(0, 0, WINDOW_WIDTH - STATS_PANEL_WIDTH, WINDOW_HEIGHT)
+        side_rect = pygame.Rect(WINDOW_WIDTH - STATS_PANEL_WIDTH, 0, STATS_PANEL_WIDTH, WINDOW_HEIGHT)
+        
+        # Панели перерисовываются в кэше только при изменении своих данных
+        top_panel, top_changed = self._top_panel()
+        bottom_panel, bottom_changed = self._bottom_panel()
+        side_panel, side_changed = self._side_panel()
+        graphs, graphs_changed = self._graphs_surface()
+        
+        camera = (self.camera_x, self.camera_y)
+        camera_moved = camera != self.last_drawn_camera
+        self.last_drawn_camera = camera
+        
+        # Полупрозрачные панели лежат поверх мира, поэтому их изменение
+        # требует перерисовки мира под ними
+        world_dirty = (self.world_dirty or camera_moved or bool(self.dirty_tiles) or
+                       top_changed or bottom_changed or graphs_changed)
+        side_dirty = (top_changed or side_changed or camera_moved or
+                      bool(self.minimap_dirty_tiles) or self.world_dirty)
+        
+        dirty_rects = []
+        if world_dirty:
+            self.screen.fill(COLORS['BLACK'], world_rect)
+            self._draw_game_world()
+            self.screen.set_clip(world_rect)
+            self.screen.blit(top_panel, (0, 0))
+            self.screen.blit(bottom_panel, (0, WINDOW_HEIGHT - UI['PANEL_HEIGHT']))
+            if self.show_graphs:
+                self.screen.blit(graphs, ((WINDOW_WIDTH - 600) // 2, (WINDOW_HEIGHT - 400) // 2))
+            self.screen.set_clip(None)
+            dirty_rects.append(world_rect)
+        
+        if side_dirty:
+            self.screen.set_clip(side_rect)
+            self.screen.fill(COLORS['BLACK'], side_rect)
+            self.screen.blit(top_panel, (0, 0))
+            self.screen.blit(side_panel, side_rect.topleft)
+            self.screen.set_clip(None)
+            self._draw_minimap()
+            dirty_rects.append(side_rect)
+        
+        self.world_dirty = False
+        if dirty_rects:
+            pygame.display.update(dirty_rects)
+    
+    def _cached_panel(self, name: str, signature, render) -> Tuple[pygame.Surface, bool]:
+        """Поверхность панели из кэша; render вызывается только при изменении signature"""
+        cached = self.panel_cache.get(name)
+        if cached is not None and cached[0] == signature:
+            return cached[1], False
+        surface = render()
+        self.panel_cache[name] = (signature, surface)
+        return surface, True
+    
+    def _buttons_state(self, *names) -> Tuple:
+        """Состояние кнопок, влияющее на их отрисовку"""
+        return tuple((self.buttons[name].text, self.buttons[name].hover, self.buttons[name].active)
+                     for name in names)
+    
+    def _world_viewport(self) -> pygame.Rect:
+        """Область экрана с миром, не закрытая панелями"""
+        return pygame.Rect(0, UI['TOP_BAR_HEIGHT'], WINDOW_WIDTH - STATS_PANEL_WIDTH,
+                           WINDOW_HEIGHT - UI['TOP_BAR_HEIGHT'] - UI['PANEL_HEIGHT'])
+    
+    def _visible_world_rect(self) -> pygame.Rect:
+        """Прямоугольник мира, видимый камерой"""
+        return pygame.Rect(self.camera_x, self.camera_y,
+                           WINDOW_WIDTH - STATS_PANEL_WIDTH, WINDOW_HEIGHT)
+    
     def _draw_game_world(self):
-        """Отрисовка игрового мира"""
-        # Очищаем поверхность мира
-        self.world_surface.fill(COLORS['DARK_BLUE'])
-        
-        # Отрисовка тайлов карты
-        for y in range(GRID_HEIGHT):
-            for x in range(GRID_WIDTH):
-                tile_type = self.tile_map[y][x]
-                color = COLORS['GREEN'] if tile_type == TILES['GRASS'] else \
-                       COLORS['BLUE'] if tile_type == TILES['WATER'] else \
-                       COLORS['YELLOW'] if tile_type == TILES['PATH'] else \
-                       COLORS['ORANGE'] if tile_type == TILES['FARM'] else \
-                       COLORS['RED'] if tile_type == TILES['HOUSE'] else \
-                       COLORS['GRAY']
-                
-                rect = pygame.Rect(x * TILE_SIZE, y * TILE_SIZE, TILE_SIZE, TILE_SIZE)
-                pygame.draw.rect(self.world_surface, color, rect)
-                pygame.draw.rect(self.world_surface, COLORS['BLACK'], rect, 1)
+        """Отрисовка видимой части игрового мира прямо на экран"""
+        view = self._visible_world_rect()
+        offset_x, offset_y = -self.camera_x, -self.camera_y
+        self.screen.set_clip(pygame.Rect(0, 0, view.width, view.height))
+        
+        # Статичная местность берётся из кэша, только видимая область
+        self._update_terrain_layer()
+        self._draw_terrain(view)
         
-        # Отрисовка объектов
-        for obj in self.objects:
+        # Отрисовка объектов, попадающих в камеру
+        for obj in self.object_index.query_rect(view):
             x, y = obj.position
             rect = pygame.Rect(x * TILE_SIZE, y * TILE_SIZE, 
                               obj.size[0] * TILE_SIZE, obj.size[1] * TILE_SIZE)
-            pygame.draw.rect(self.world_surface, obj.color, rect)
-            pygame.draw.rect(self.world_surface, COLORS['BLACK'], rect, 2)
+            rect.move_ip(offset_x, offset_y)
+            pygame.draw.rect(self.screen, obj.color, rect)
+            pygame.draw.rect(self.screen, COLORS['BLACK'], rect, 2)
         
-        # Отрисовка жителей
-        for villager in self.villagers:
+        # Отрисовка жителей, попадающих в камеру
+        for villager in self.villager_index.query_rect(view):
             x, y = villager.position
             rect = pygame.Rect(int(x), int(y), 
                               int(TILE_SIZE / 2), int(TILE_SIZE / 2))
-            pygame.draw.rect(self.world_surface, COLORS['RED'], rect)
+            rect.move_ip(offset_x, offset_y)
+            pygame.draw.rect(self.screen, COLORS['RED'], rect)
         
-        # Отображение world_surface на экран с учетом камеры
-        visible_rect = pygame.Rect(self.camera_x, self.camera_y, 
-                                  WINDOW_WIDTH - STATS_PANEL_WIDTH, WINDOW_HEIGHT)
-        self.screen.blit(self.world_surface, (0, 0), visible_rect)
+        self.screen.set_clip(None)
     
-    def _draw_top_panel(self):
-        panel = pygame.Surface((WINDOW_WIDTH, UI['TOP_BAR_HEIGHT']), pygame.SRCALPHA)
-        panel.fill(COLORS['DARK_BLUE'])
-        
-        # Кнопки управления
-        self.buttons['pause'].draw(panel, self.font)
-        self.buttons['speed_up'].draw(panel, self.font)
-        self.buttons['speed_down'].draw(panel, self.font)
-        
-        # Ресурсы
-        x = 400
+    def _top_panel(self) -> Tuple[pygame.Surface, bool]:
+        buttons = ('pause', 'speed_up', 'speed_down')
         resources = [
-            ("💰", self.model.economy['total_wealth']),
-            ("🌾", self.model.economy['resources']['food']),
-            ("⚒️", self.model.economy['resources']['tools']),
-            ("📦", self.model.economy['resources']['materials'])
+            ("💰", self.snapshot.total_wealth),
+            ("🌾", self.snapshot.resources['food']),
+            ("⚒️", self.snapshot.resources['tools']),
+            ("📦", self.snapshot.resources['materials'])
         ]
+        signature = (self._buttons_state(*buttons),
+                     tuple((int(value), value > 0) for _, value in resources))
         
-        for icon, value in resources:
-            text = f"{icon} {int(value)}"
-            color = COLORS['GREEN'] if value > 0 else COLORS['RED']
-            text_surface = self.font.render(text, True, color)
-            panel.blit(text_surface, (x, 15))
-            x += 150
-        
+        def render():
+            panel = pygame.Surface((WINDOW_WIDTH, UI['TOP_BAR_HEIGHT']), pygame.SRCALPHA)
+            panel.fill(COLORS['DARK_BLUE'])
+            
+            # Кнопки управления
+            for name in buttons:
+                self.buttons[name].draw(panel, self.font)
+            
+            # Ресурсы
+            x = 400
+            for icon, value in resources:
+                text = f"{icon} {int(value)}"
+                color = COLORS['GREEN'] if value > 0 else COLORS['RED']
+                text_surface = TEXT_CACHE.render(self.font, text, color)
+                panel.blit(text_surface, (x, 15))
+                x += 150
+            return panel
+        
+        return self._cached_panel('top', signature, render)
+    
+    def _draw_top_panel(self):
+        panel, _ = self._top_panel()
         self.screen.blit(panel, (0, 0))
-
-    def _draw_bottom_panel(self):
-        panel = pygame.Surface((WINDOW_WIDTH - STATS_PANEL_WIDTH, UI['PANEL_HEIGHT']), pygame.SRCALPHA)
-        panel.fill(COLORS['DARK_BLUE'])
+    
+    def _bottom_panel(self) -> Tuple[pygame.Surface, bool]:
+        buttons = ('build_house', 'build_farm', 'build_factory',
+                   'show_stats', 'show_jobs', 'show_resources')
         
-        # Кнопки меню
-        self.buttons['build_house'].draw(panel, self.font)
-        self.buttons['build_farm'].draw(panel, self.font)
-        self.buttons['build_factory'].draw(panel, self.font)
-        self.buttons['show_stats'].draw(panel, self.font)
-        self.buttons['show_jobs'].draw(panel, self.font)
-        self.buttons['show_resources'].draw(panel, self.font)
+        def render():
+            panel = pygame.Surface((WINDOW_WIDTH - STATS_PANEL_WIDTH, UI['PANEL_HEIGHT']), pygame.SRCALPHA)
+            panel.fill(COLORS['DARK_BLUE'])
+            
+            # Кнопки меню
+            for name in buttons:
+                self.buttons[name].draw(panel, self.font)
+            return panel
         
+        return self._cached_panel('bottom', self._buttons_state(*buttons), render)
+    
+    def _draw_bottom_panel(self):
+        panel, _ = self._bottom_panel()
         self.screen.blit(panel, (0, WINDOW_HEIGHT - UI['PANEL_HEIGHT']))
     
-    def _draw_side_panel(self):
-        """Отрисовка боковой панели с информацией"""
-        panel = pygame.Surface((STATS_PANEL_WIDTH, WINDOW_HEIGHT), pygame.SRCALPHA)
-        panel.fill(COLORS['DARK_BLUE'])
-        
-        # Заголовок
-        title = self.font.render("Информация", True, COLORS['TEXT'])
-        panel.blit(title, (STATS_PANEL_WIDTH // 2 - title.get_width() // 2, 10))
-        
+    def _side_panel(self) -> Tuple[pygame.Surface, bool]:
         # Статистика поселения
-        stats_y = 70
-        stats = [
-            f"Население: {len(self.model.village_agents)}",
-            f"Счастье: {self.model.social_metrics['average_happiness']:.1f}",
-            f"Богатство: {self.model.economy['total_wealth']}",
-            f"Еда: {self.model.economy['resources'].get('food', 0)}",
-            f"Инструменты: {self.model.economy['resources'].get('tools', 0)}",
-            f"Дома: {sum(1 for obj in self.objects if obj.type == 'house')}",
-            f"Фермы: {sum(1 for obj in self.objects if obj.type == 'farm')}",
-            f"Фабрики: {sum(1 for obj in self.objects if obj.type == 'factory')}"
-        ]
+        stats = (
+            f"Население: {self.snapshot.population}",
+            f"Счастье: {self.snapshot.average_happiness:.1f}",
+            f"Богатство: {self.snapshot.total_wealth}",
+            f"Еда: {self.snapshot.resources.get('food', 0)}",
+            f"Инструменты: {self.snapshot.resources.get('tools', 0)}",
+            f"Дома: {self.object_counts['house']}",
+            f"Фермы: {self.object_counts['farm']}",
+            f"Фабрики: {self.object_counts['factory']}"
+        )
         
-        for i, stat in enumerate(stats):
-            text = self.font.render(stat, True, COLORS['TEXT'])
-            panel.blit(text, (20, stats_y + i * 30))
+        def render():
+            panel = pygame.Surface((STATS_PANEL_WIDTH, WINDOW_HEIGHT), pygame.SRCALPHA)
+            panel.fill(COLORS['DARK_BLUE'])
+            
+            # Заголовок
+            title = TEXT_CACHE.render(self.font, "Информация", COLORS['TEXT'])
+            panel.blit(title, (STATS_PANEL_WIDTH // 2 - title.get_width() // 2, 10))
+            
+            stats_y = 70
+            for i, stat in enumerate(stats):
+                text = TEXT_CACHE.render(self.font, stat, COLORS['TEXT'])
+                panel.blit(text, (20, stats_y + i * 30))
+            return panel
         
+        return self._cached_panel('side', stats, render)
+    
+    def _draw_side_panel(self):
+        """Отрисовка боковой панели с информацией"""
+        panel, _ = self._side_panel()
         self.screen.blit(panel, (WINDOW_WIDTH - STATS_PANEL_WIDTH, 0))
     
+    def _update_minimap_terrain(self):
+        """Построение кэша мини-карты уменьшением карты тайлов; далее - только изменённые тайлы"""
+        minimap_size = UI['MINIMAP_SIZE']
+        if self.minimap_terrain is None:
+            # Для каждого пикселя мини-карты - ближайший тайл
+            xs = np.arange(minimap_size) * GRID_WIDTH // minimap_size
+            ys = np.arange(minimap_size) * GRID_HEIGHT // minimap_size
+            tiles = self.tile_map[np.ix_(ys, xs)]
+            self.minimap_terrain = pygame.surfarray.make_surface(TILE_PALETTE[tiles.T])
+        else:
+            for x, y in self.minimap_dirty_tiles:
+                # Пиксели, для которых ближайшим тайлом является (x, y)
+                left = -(-x * minimap_size // GRID_WIDTH)
+                right = -(-(x + 1) * minimap_size // GRID_WIDTH)
+                top = -(-y * minimap_size // GRID_HEIGHT)
+                bottom = -(-(y + 1) * minimap_size // GRID_HEIGHT)
+                color = TILE_PALETTE[self.tile_map[y, x]].tolist()
+                self.minimap_terrain.fill(color, (left, top, right - left, bottom - top))
+        self.minimap_dirty_tiles.clear()
+    
     def _draw_minimap(self):
         """Отрисовка мини-карты"""
         minimap_size = UI['MINIMAP_SIZE']
-        minimap = pygame.Surface((minimap_size, minimap_size))
-        minimap.fill(COLORS['DARK_BLUE'])
+        minimap_pos = (WINDOW_WIDTH - STATS_PANEL_WIDTH + 20, 
+                       WINDOW_HEIGHT - minimap_size - 20)
+        
+        # Местность из кэша
+        self._update_minimap_terrain()
+        self.screen.blit(self.minimap_terrain, minimap_pos)
         
         # Масштаб мини-карты
         scale_x = minimap_size / (GRID_WIDTH * TILE_SIZE)
         scale_y = minimap_size / (GRID_HEIGHT * TILE_SIZE)
         
-        # Отрисовка карты в миниатюре
-        for y in range(GRID_HEIGHT):
-            for x in range(GRID_WIDTH):
-                tile_type = self.tile_map[y][x]
-                color = COLORS['GREEN'] if tile_type == TILES['GRASS'] else \
-                       COLORS['BLUE'] if tile_type == TILES['WATER'] else \
-                       COLORS['YELLOW'] if tile_type == TILES['PATH'] else \
-                       COLORS['ORANGE'] if tile_type == TILES['FARM'] else \
-                       COLORS['RED'] if tile_type == TILES['HOUSE'] else \
-                       COLORS['GRAY']
-                
-                mini_x = int(x * TILE_SIZE * scale_x)
-                mini_y = int(y * TILE_SIZE * scale_y)
-                mini_w = max(1, int(TILE_SIZE * scale_x))
-                mini_h = max(1, int(TILE_SIZE * scale_y))
-                
-                pygame.draw.rect(minimap, color, (mini_x, mini_y, mini_w, mini_h))
-        
-        # Отображение текущего видимого прямоугольника камеры
+        # Отображение текущего видимого прямоугольника камеры (каждый кадр)
         view_rect = pygame.Rect(
-            int(self.camera_x * scale_x),
-            int(self.camera_y * scale_y),
+            minimap_pos[0] + int(self.camera_x * scale_x),
+            minimap_pos[1] + int(self.camera_y * scale_y),
             int((WINDOW_WIDTH - STATS_PANEL_WIDTH) * scale_x),
             int(WINDOW_HEIGHT * scale_y)
         )
-        pygame.draw.rect(minimap, COLORS['WHITE'], view_rect, 2)
+        self.screen.set_clip(pygame.Rect(minimap_pos, (minimap_size, minimap_size)))
+        pygame.draw.rect(self.screen, COLORS['WHITE'], view_rect, 2)
+        self.screen.set_clip(None)
+    
+    def _graphs_surface(self) -> Tuple[pygame.Surface, bool]:
+        # Скрытые графики не перерисовываются при пополнении истории
+        signature = (
+            self.show_graphs,
+            len(self.stats_history['happiness']) if self.show_graphs else 0,
+            len(self.stats_history['wealth']) if self.show_graphs else 0
+        )
         
-        # Размещение мини-карты на экране
-        self.screen.blit(minimap, (WINDOW_WIDTH - STATS_PANEL_WIDTH + 20, 
-                                 WINDOW_HEIGHT - minimap_size - 20))
+        def render():
+            graph_surface = pygame.Surface((600, 400))
+            graph_surface.fill(COLORS['DARK_BLUE'])
+            
+            # Рисуем графики
+            if self.stats_history['happiness']:
+                values = self.stats_history['happiness'].recent(300)
+                points = np.column_stack([np.arange(len(values)) * 2, 380 - values * 360]).tolist()
+                if len(points) > 1:
+                    pygame.draw.lines(graph_surface, COLORS['GREEN'], False, points, 2)
+            
+            if self.stats_history['wealth']:
+                # Максимум за всё время поддерживается историей при добавлении
+                max_wealth = self.stats_history['wealth'].max
+                if max_wealth > 0:
+                    values = self.stats_history['wealth'].recent(300)
+                    points = np.column_stack([np.arange(len(values)) * 2,
+                                              380 - (values / max_wealth) * 360]).tolist()
+                    if len(points) > 1:
+                        pygame.draw.lines(graph_surface, COLORS['YELLOW'], False, points, 2)
+            return graph_surface
+        
+        return self._cached_panel('graphs', signature, render)
     
     def _draw_graphs(self):
-        graph_surface = pygame.Surface((600, 400))
-        graph_surface.fill(COLORS['DARK_BLUE'])
-        
-        # Рисуем графики
-        if self.stats_history['happiness']:
-            points = [(i * 2, 380 - val * 360) for i, val in enumerate(self.stats_history['happiness'][-300:])]
-            if len(points) > 1:
-                pygame.draw.lines(graph_surface, COLORS['GREEN'], False, points, 2)
-        
-        if self.stats_history['wealth']:
-            max_wealth = max(self.stats_history['wealth'])
-            if max_wealth > 0:
-                points = [(i * 2, 380 - (val / max_wealth) * 360) 
-                         for i, val in enumerate(self.stats_history['wealth'][-300:])]
-                if len(points) > 1:
-                    pygame.draw.lines(graph_surface, COLORS['YELLOW'], False, points, 2)
+        graph_surface, _ = self._graphs_surface()
         
         # Отображаем графики по центру экрана
         self.screen.blit(graph_surface, 
@@ -605,44 +844,143 @@ class VillageGame:
         if button_name == 'pause':
             self.paused = not self.paused
             self.buttons['pause'].text = "▶️ Старт" if self.paused else "⏸️ Пауза"
+            if self.paused:
+                self.simulation.pause()
+            else:
+                self.simulation.resume()
         
         elif button_name == 'speed_up':
-            self.game_speed = min(4.0, self.game_speed + 0.5)
+            self.game_speed = min(MAX_GAME_SPEED, self.game_speed * 2)
+            self.simulation.days_per_second = self._days_per_second()
         
         elif button_name == 'speed_down':
-            self.game_speed = max(0.5, self.game_speed - 0.5)
+            self.game_speed = max(0.5, self.game_speed / 2)
+            self.simulation.days_per_second = self._days_per_second()
         
         elif button_name == 'show_stats':
             self.show_graphs = not self.show_graphs
             self.buttons['show_stats'].active = self.show_graphs
 
+    def _days_per_second(self) -> float:
+        """Скорость симуляции в днях в секунду с учётом ускорения"""
+        return self.game_speed * 1000 / self.model_update_interval
+
     def _update_stats_history(self):
-        stats = self.model.get_statistics()
-        self.stats_history['happiness'].append(stats['social_metrics']['average_happiness'])
-        self.stats_history['wealth'].append(stats['economy']['total_wealth'])
-        self.stats_history['population'].append(stats['population'])
+        snapshot = self.snapshot
+        self.stats_history['happiness'].append(snapshot.average_happiness)
+        self.stats_history['wealth'].append(snapshot.total_wealth)
+        self.stats_history['population'].append(snapshot.population)
         
         for resource in self.stats_history['resources']:
             self.stats_history['resources'][resource].append(
-                stats['economy']['resources'][resource]
+                snapshot.resources[resource]
             )
     
     def _update_model(self):
-        if not self.paused:
-            # ... существующий код обновления ...
+        """Получение свежего среза модели от фонового потока"""
+        snapshot = self.simulation.snapshot
+        if snapshot.day != self.snapshot.day:
+            self.snapshot = snapshot
             self._update_stats_history()
     
+    def _update_villagers(self):
+        """Движение всех жителей за один векторный шаг"""
+        if self.paused:
+            return
+        manager = self.sprite_manager
+        now = pygame.time.get_ticks()
+        
+        # Отдохнувшие жители периодически получают новые цели
+        if now - self.last_target_update >= self.target_update_interval:
+            self.last_target_update = now
+            ready = np.flatnonzero(manager.moving[:manager.size] & ~manager.has_target[:manager.size])
+            if len(ready):
+                targets = np.column_stack([
+                    np.random.randint(0, GRID_WIDTH * TILE_SIZE - TILE_SIZE, len(ready)),
+                    np.random.randint(0, GRID_HEIGHT * TILE_SIZE - TILE_SIZE, len(ready))
+                ])
+                manager.move_many(ready, targets)
+        
+        if len(manager.step(now)):
+            self.world_dirty = True
+    
+    def _ai_statistics(self) -> Dict:
+        """Статистика модели из последнего среза (как get_statistics())"""
+        return {
+            'date': self.snapshot.date,
+            'population': self.snapshot.population,
+            'economy': dict(self.snapshot.economy),
+            'social_metrics': dict(self.snapshot.social_metrics)
+        }
+    
+    def _build_ai_prompt(self, statistics: Dict, distributions: Dict) -> str:
+        """Сжатое описание текущего состояния деревни для ИИ-советника"""
+        return self.ai_controller.prompt_builder.build(statistics, distributions, self.stats_history)
+    
+    def _update_ai(self):
+        """Неблокирующий цикл запросов к ИИ: отправка, таймаут и приём ответов"""
+        now = pygame.time.get_ticks()
+        
+        # Ответы завершившихся запросов попадают в очередь в главном потоке
+        self.ai_action_queue.extend(self.ai_controller.poll())
+        self.ai_request_in_progress = self.ai_controller.in_flight > 0
+        
+        if self.ai_request_in_progress:
+            if now - self.ai_last_request_time > self.ai_request_timeout:
+                self.ai_logger.warning("Таймаут запроса к ИИ, запрос отменён")
+                self.ai_controller.cancel_all()
+                self.ai_request_in_progress = False
+            return
+        
+        if not self.ai_control or now - self.last_ai_update < self.ai_update_interval:
+            return
+        
+        if self.ai_distributions is None:
+            # При попадании в кэш промпт и распределения не нужны
+            statistics = self._ai_statistics()
+            if self.ai_controller.submit_cached(statistics) is not None:
+                self._ai_request_sent(now)
+                return
+            # Распределения считает поток симуляции между шагами, кадр их не ждёт
+            self.ai_pending_statistics = statistics
+            self.ai_distributions = self.simulation.request_distributions(
+                self.ai_controller.prompt_builder.percentiles)
+            return
+        if not self.ai_distributions.done():
+            return
+        
+        future, self.ai_distributions = self.ai_distributions, None
+        statistics, self.ai_pending_statistics = self.ai_pending_statistics, None
+        try:
+            distributions = future.result()
+        except Exception as e:
+            self.ai_logger.error(f"Не удалось получить распределения для промпта: {e}")
+            distributions = {}
+        prompt = self._build_ai_prompt(statistics, distributions)
+        if self.ai_controller.submit(prompt, statistics, check_cache=False) is not None:
+            self._ai_request_sent(now)
+    
+    def _ai_request_sent(self, now: int):
+        self.last_ai_update = now
+        self.ai_last_request_time = now
+        self.ai_request_in_progress = True
+    
     def run(self):
         """Главный игровой цикл"""
         clock = pygame.time.Clock()
+        self.simulation.start()
         
         while self.running:
             self.handle_events()
             self._handle_camera_movement()
             self._update_model()  # Обновление модели
+            self._update_villagers()
+            self._update_ai()
             self.draw()
             clock.tick(60)
         
+        self.simulation.stop()
+        self.ai_controller.close()
         pygame.quit()
         sys.exit()
 
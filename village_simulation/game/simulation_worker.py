@@ -0,0 +1,174 @@
+import copy
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+from datetime import datetime
+from types import MappingProxyType
+from typing import Any, Mapping, Optional, Sequence, Tuple
+from village_simulation.ai.prompt_builder import model_distributions
+from village_simulation.src.village_model import VillageModel
+
+logger = logging.getLogger('village_simulation')
+
+
+@dataclass(frozen=True)
+class SimulationSnapshot:
+    """Неизменяемый срез состояния модели для отрисовки"""
+    day: int
+    date: datetime
+    population: int
+    total_wealth: float
+    average_happiness: float
+    resources: Mapping[str, Any]
+    economy: Mapping[str, Any]
+    social_metrics: Mapping[str, Any]
+
+    @classmethod
+    def capture(cls, model: VillageModel, day: int) -> 'SimulationSnapshot':
+        """Копия текущей статистики модели"""
+        stats = model.get_statistics()
+        economy = copy.deepcopy(stats['economy'])
+        social_metrics = copy.deepcopy(stats['social_metrics'])
+        return cls(
+            day=day,
+            date=stats['date'],
+            population=stats['population'],
+            total_wealth=economy['total_wealth'],
+            average_happiness=social_metrics['average_happiness'],
+            resources=MappingProxyType(economy['resources']),
+            economy=MappingProxyType(economy),
+            social_metrics=MappingProxyType(social_metrics)
+        )
+
+
+class SimulationWorker:
+    """Фоновый поток, продвигающий VillageModel с заданной скоростью.
+
+    Поток делает столько шагов (дней), сколько положено по days_per_second,
+    и после каждой пачки шагов публикует SimulationSnapshot. Срезы лежат в
+    двух буферах: новый записывается в задний буфер, после чего индекс
+    переднего переключается одним присваиванием, поэтому отрисовка читает
+    snapshot без блокировок. Данные сверх среза (распределения по жителям)
+    запрашиваются через Future и считаются этим же потоком между шагами.
+    """
+
+    def __init__(self, model: VillageModel, days_per_second: float = 1.0,
+                 max_steps_per_batch: int = 50, max_backlog_days: float = 100.0):
+        self.model = model
+        self.days_per_second = days_per_second
+        # Не больше стольких шагов между публикациями срезов
+        self.max_steps_per_batch = max_steps_per_batch
+        # Если модель не успевает, отставание сверх этого порога отбрасывается
+        self.max_backlog_days = max_backlog_days
+        self.day = 0
+        self.error: Optional[BaseException] = None
+
+        self._buffers = [SimulationSnapshot.capture(model, 0), None]
+        self._front = 0
+        # Запросы распределений: (future, перцентили)
+        self._requests: "queue.Queue[Tuple[Future, Sequence[int]]]" = queue.Queue()
+        self._paused = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def snapshot(self) -> SimulationSnapshot:
+        """Последний опубликованный срез"""
+        return self._buffers[self._front]
+
+    @property
+    def paused(self) -> bool:
+        return self._paused.is_set()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Запуск фонового потока"""
+        if self.running:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name='village-simulation', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = 5.0):
+        """Остановка потока (текущий шаг модели дорабатывает до конца)"""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self._serve_requests()
+
+    def pause(self):
+        self._paused.set()
+
+    def resume(self):
+        self._paused.clear()
+
+    def request_distributions(self, percentiles: Sequence[int] = (10, 50, 90)) -> Future:
+        """Перцентили богатства и счастья по жителям (model_distributions).
+
+        Считаются в потоке симуляции между шагами, поэтому вызывающий поток
+        не ждёт окончания шага; результат забирается из Future, когда готов.
+        """
+        future: Future = Future()
+        if not self.running:
+            future.set_result(model_distributions(self.model, percentiles))
+            return future
+        self._requests.put((future, percentiles))
+        return future
+
+    def _serve_requests(self):
+        """Ответ на накопившиеся запросы распределений (из потока симуляции)"""
+        while True:
+            try:
+                future, percentiles = self._requests.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                future.set_result(model_distributions(self.model, percentiles))
+            except Exception as e:
+                future.set_exception(e)
+
+    def _publish(self):
+        """Запись нового среза в задний буфер и переключение буферов"""
+        back = 1 - self._front
+        self._buffers[back] = SimulationSnapshot.capture(self.model, self.day)
+        self._front = back
+
+    def _run(self):
+        backlog = 0.0
+        last = time.perf_counter()
+        try:
+            while not self._stopped.is_set():
+                self._serve_requests()
+                now = time.perf_counter()
+                elapsed, last = now - last, now
+                if self._paused.is_set() or self.days_per_second <= 0:
+                    backlog = 0.0
+                    self._stopped.wait(0.05)
+                    continue
+
+                backlog = min(backlog + elapsed * self.days_per_second, self.max_backlog_days)
+                steps = min(int(backlog), self.max_steps_per_batch)
+                if not steps:
+                    # Ожидание до следующего дня, но не дольше 50 мс,
+                    # чтобы быстро реагировать на смену скорости и паузу
+                    self._stopped.wait(min((1 - backlog) / self.days_per_second, 0.05))
+                    continue
+
+                for _ in range(steps):
+                    self.model.step()
+                    self.day += 1
+                backlog -= steps
+                self._publish()
+        except Exception as e:
+            self.error = e
+            logger.exception(f"Ошибка в потоке симуляции: {e}")
+        finally:
+            # Запросы, пришедшие до остановки потока, не должны ждать вечно
+            self._serve_requests()
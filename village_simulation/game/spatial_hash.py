@@ -0,0 +1,126 @@
+import math
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import pygame
+
+
+class SpatialHash:
+    """Равномерная сетка для быстрого поиска объектов по области.
+
+    Каждый объект хранится вместе со своим прямоугольником и попадает во все
+    ячейки, которые этот прямоугольник покрывает. Запросы проверяют только
+    ячейки вокруг области поиска и возвращают объекты в порядке добавления,
+    поэтому порядок совпадает с обходом исходного списка.
+
+    Если задан bounds, точные проверки берут текущий прямоугольник объекта
+    через bounds(item), и move() нужен только при переходе в другие ячейки.
+    """
+
+    def __init__(self, cell_size: int = 64,
+                 bounds: Optional[Callable[[Any], pygame.Rect]] = None):
+        self.cell_size = cell_size
+        self.bounds = bounds
+        self._cells: Dict[Tuple[int, int], set] = {}
+        # id объекта -> (объект, прямоугольник, диапазон ячеек, порядковый номер)
+        self._entries: Dict[int, Tuple[Any, pygame.Rect, Tuple[int, int, int, int], int]] = {}
+        self._counter = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, item) -> bool:
+        return id(item) in self._entries
+
+    def _cell_range(self, rect: pygame.Rect) -> Tuple[int, int, int, int]:
+        size = self.cell_size
+        return (rect.left // size, rect.top // size,
+                (rect.right - 1) // size if rect.width else rect.left // size,
+                (rect.bottom - 1) // size if rect.height else rect.top // size)
+
+    def _link(self, key: int, cells: Tuple[int, int, int, int]):
+        x0, y0, x1, y1 = cells
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                self._cells.setdefault((cx, cy), set()).add(key)
+
+    def _unlink(self, key: int, cells: Tuple[int, int, int, int]):
+        x0, y0, x1, y1 = cells
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                cell = self._cells[(cx, cy)]
+                cell.discard(key)
+                if not cell:
+                    del self._cells[(cx, cy)]
+
+    def insert(self, item, rect: pygame.Rect):
+        """Добавление объекта (или перемещение уже добавленного)"""
+        key = id(item)
+        if key in self._entries:
+            self.move(item, rect)
+            return
+        rect = pygame.Rect(rect)
+        cells = self._cell_range(rect)
+        self._entries[key] = (item, rect, cells, self._counter)
+        self._counter += 1
+        self._link(key, cells)
+
+    def move(self, item, rect: pygame.Rect):
+        """Обновление прямоугольника объекта; ячейки меняются только при переходе границы"""
+        key = id(item)
+        _, _, old_cells, order = self._entries[key]
+        rect = pygame.Rect(rect)
+        cells = self._cell_range(rect)
+        if cells != old_cells:
+            self._unlink(key, old_cells)
+            self._link(key, cells)
+        self._entries[key] = (item, rect, cells, order)
+
+    def remove(self, item):
+        """Удаление объекта из индекса"""
+        key = id(item)
+        _, _, cells, _ = self._entries.pop(key)
+        self._unlink(key, cells)
+
+    def _candidates(self, rect: pygame.Rect) -> set:
+        x0, y0, x1, y1 = self._cell_range(rect)
+        keys = set()
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                cell = self._cells.get((cx, cy))
+                if cell:
+                    keys |= cell
+        return keys
+
+    def _rect(self, key: int) -> pygame.Rect:
+        item, rect = self._entries[key][:2]
+        return rect if self.bounds is None else self.bounds(item)
+
+    def _ordered(self, keys) -> List[Any]:
+        entries = sorted((self._entries[key] for key in keys), key=lambda entry: entry[3])
+        return [entry[0] for entry in entries]
+
+    def query_point(self, x: float, y: float) -> List[Any]:
+        """Объекты, прямоугольник которых содержит точку"""
+        cell = self._cells.get((int(x) // self.cell_size, int(y) // self.cell_size), ())
+        return self._ordered(key for key in cell
+                             if self._rect(key).collidepoint(x, y))
+
+    def query_rect(self, rect: pygame.Rect) -> List[Any]:
+        """Объекты, прямоугольник которых пересекается с rect (отсечение по камере)"""
+        rect = pygame.Rect(rect)
+        return self._ordered(key for key in self._candidates(rect)
+                             if self._rect(key).colliderect(rect))
+
+    def query_radius(self, x: float, y: float, radius: float) -> List[Any]:
+        """Объекты, прямоугольник которых находится не дальше radius от точки"""
+        left, top = math.floor(x - radius), math.floor(y - radius)
+        bounds = pygame.Rect(left, top,
+                             math.ceil(x + radius) - left + 1, math.ceil(y + radius) - top + 1)
+        found = []
+        for key in self._candidates(bounds):
+            rect = self._rect(key)
+            # Ближайшая к точке точка прямоугольника
+            dx = x - max(rect.left, min(x, rect.right))
+            dy = y - max(rect.top, min(y, rect.bottom))
+            if dx * dx + dy * dy <= radius * radius:
+                found.append(key)
+        return self._ordered(found)
@@ -0,0 +1,165 @@
+import random
+from typing import Any, List, Optional, Tuple
+import numpy as np
+import pygame
+
+# Направления взгляда жителя; в массиве хранится индекс
+DIRECTIONS = ('down', 'up', 'left', 'right')
+
+
+class SpriteManager:
+    """Состояние движения всех жителей в массивах NumPy.
+
+    Позиции, цели, скорости, таймеры отдыха и кадры анимации хранятся по
+    строке на жителя; step() продвигает всех жителей одной векторной
+    операцией за кадр. VillagerSprite - представление одной строки.
+    """
+
+    def __init__(self, capacity: int = 0):
+        self.size = 0
+        self.capacity = 0
+        self.sprites: List[Any] = []
+        # Пространственный индекс (SpatialHash), обновляемый при движении
+        self.spatial_index = None
+        self._grow(max(0, capacity))
+
+    def _grow(self, new_capacity: int):
+        """Увеличение ёмкости всех массивов"""
+        def grow(old: Optional[np.ndarray], shape, dtype, fill=0):
+            new = np.full(shape, fill, dtype=dtype)
+            if old is not None:
+                new[:self.size] = old[:self.size]
+            return new
+
+        self.positions = grow(getattr(self, 'positions', None), (new_capacity, 2), np.float64)
+        self.targets = grow(getattr(self, 'targets', None), (new_capacity, 2), np.float64)
+        self.has_target = grow(getattr(self, 'has_target', None), new_capacity, bool)
+        self.moving = grow(getattr(self, 'moving', None), new_capacity, bool)
+        self.speeds = grow(getattr(self, 'speeds', None), new_capacity, np.float64)
+        self.rest_timers = grow(getattr(self, 'rest_timers', None), new_capacity, np.int64)
+        self.rest_durations = grow(getattr(self, 'rest_durations', None), new_capacity, np.int64)
+        self.animation_frames = grow(getattr(self, 'animation_frames', None), new_capacity, np.float64)
+        self.animation_speeds = grow(getattr(self, 'animation_speeds', None), new_capacity, np.float64)
+        self.directions = grow(getattr(self, 'directions', None), new_capacity, np.int8)
+        self.sizes = grow(getattr(self, 'sizes', None), new_capacity, np.int64)
+        # Ячейки пространственного индекса, в которых сейчас учтён житель
+        self.indexed_cells = grow(getattr(self, 'indexed_cells', None), (new_capacity, 4), np.int64)
+        self.capacity = new_capacity
+
+    def add(self, sprite, position: Tuple[float, float], size: int = 16, speed: float = 2,
+            animation_speed: float = 0.2, rest_duration: Optional[int] = None) -> int:
+        """Регистрация жителя, возвращает индекс его строки"""
+        if self.size >= self.capacity:
+            self._grow(max(16, self.capacity * 2))
+        index = self.size
+        self.size += 1
+        self.sprites.append(sprite)
+        self.positions[index] = position
+        self.has_target[index] = False
+        self.moving[index] = False
+        self.speeds[index] = speed
+        self.rest_timers[index] = 0
+        self.rest_durations[index] = (random.randint(1000, 3000)  # 1-3 секунды
+                                      if rest_duration is None else rest_duration)
+        self.animation_frames[index] = 0
+        self.animation_speeds[index] = animation_speed
+        self.directions[index] = DIRECTIONS.index('down')
+        self.sizes[index] = size
+        if self.spatial_index is not None:
+            self.spatial_index.insert(sprite, sprite.bounds())
+            self.indexed_cells[index] = self._cell_ranges(np.array([index]))[0]
+        return index
+
+    def max_size(self) -> int:
+        """Наибольший размер жителя (радиус поиска при клике)"""
+        return int(self.sizes[:self.size].max()) if self.size else 0
+
+    def attach_index(self, spatial_index):
+        """Регистрация всех жителей в пространственном индексе (SpatialHash).
+
+        Индекс должен брать прямоугольники через VillagerSprite.bounds, тогда
+        при движении он обновляется только для жителей, сменивших ячейку.
+        """
+        self.spatial_index = spatial_index
+        for sprite in self.sprites:
+            spatial_index.insert(sprite, sprite.bounds())
+        self.indexed_cells[:self.size] = self._cell_ranges(np.arange(self.size))
+
+    @staticmethod
+    def _direction_codes(dx: np.ndarray, dy: np.ndarray) -> np.ndarray:
+        """Направление по вектору движения (как в VillagerSprite.move_to)"""
+        return np.where(np.abs(dx) > np.abs(dy),
+                        np.where(dx > 0, 3, 2),
+                        np.where(dy > 0, 0, 1)).astype(np.int8)
+
+    def move_many(self, indices: np.ndarray, targets: np.ndarray):
+        """Установка новых целей движения сразу для нескольких жителей"""
+        indices = np.asarray(indices, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.float64).reshape(-1, 2)
+        self.targets[indices] = targets
+        self.has_target[indices] = True
+        self.moving[indices] = True
+        delta = targets - self.positions[indices]
+        self.directions[indices] = self._direction_codes(delta[:, 0], delta[:, 1])
+
+    def step(self, now: Optional[int] = None, indices: Optional[np.ndarray] = None) -> np.ndarray:
+        """Один кадр движения для всех (или указанных) жителей.
+
+        Возвращает индексы жителей, позиция которых изменилась.
+        """
+        if now is None:
+            now = pygame.time.get_ticks()
+        if indices is None:
+            indices = np.arange(self.size)
+        indices = np.asarray(indices, dtype=np.int64)
+
+        has_target = self.has_target[indices]
+        moving = self.moving[indices]
+
+        # Движение к цели
+        walking = indices[has_target & moving]
+        delta = self.targets[walking] - self.positions[walking]
+        distance = np.sqrt(delta[:, 0] * delta[:, 0] + delta[:, 1] * delta[:, 1])
+        speed = self.speeds[walking]
+        arrived = distance < speed
+
+        done = walking[arrived]
+        self.positions[done] = self.targets[done]
+        self.has_target[done] = False
+        self.moving[done] = False
+        self.rest_timers[done] = now
+
+        going = walking[~arrived]
+        step = delta[~arrived] / distance[~arrived, None] * speed[~arrived, None]
+        self.positions[going] += step
+        self.directions[going] = self._direction_codes(step[:, 0], step[:, 1])
+        frames = self.animation_frames[going] + self.animation_speeds[going]
+        frames[frames >= 4] = 0
+        self.animation_frames[going] = frames
+
+        # Окончание отдыха
+        idle = indices[~has_target & ~moving]
+        rested = idle[now - self.rest_timers[idle] >= self.rest_durations[idle]]
+        self.moving[rested] = True
+
+        if self.spatial_index is not None and len(walking):
+            cells = self._cell_ranges(walking)
+            crossed = walking[(cells != self.indexed_cells[walking]).any(axis=1)]
+            self.indexed_cells[walking] = cells
+            for index in crossed.tolist():
+                sprite = self.sprites[index]
+                self.spatial_index.move(sprite, sprite.bounds())
+        return walking
+
+    def bounds(self, indices: np.ndarray) -> np.ndarray:
+        """Прямоугольники (left, top, width, height) жителей, как VillagerSprite.bounds()"""
+        corners = self.positions[indices].astype(np.int64)
+        sizes = self.sizes[indices]
+        return np.column_stack([corners, sizes, sizes])
+
+    def _cell_ranges(self, indices: np.ndarray) -> np.ndarray:
+        """Диапазоны ячеек индекса (x0, y0, x1, y1), покрываемые жителями"""
+        left, top, width, height = self.bounds(indices).T
+        cell = self.spatial_index.cell_size
+        return np.column_stack([left // cell, top // cell,
+                                (left + width - 1) // cell, (top + height - 1) // cell])
@@ -0,0 +1,84 @@
+from typing import List, Optional
+import numpy as np
+
+
+class RingBuffer:
+    """Кольцевой буфер фиксированной ёмкости на массиве NumPy"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._data = np.zeros(capacity, dtype=np.float64)
+        self._start = 0
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(self, value: float):
+        """Добавление значения; при заполнении вытесняется самое старое"""
+        end = (self._start + self._size) % self.capacity
+        self._data[end] = value
+        if self._size < self.capacity:
+            self._size += 1
+        else:
+            self._start = (self._start + 1) % self.capacity
+
+    def values(self, count: Optional[int] = None) -> np.ndarray:
+        """Последние count значений (по умолчанию все) в порядке добавления"""
+        count = self._size if count is None else min(count, self._size)
+        first = (self._start + self._size - count) % self.capacity
+        indices = (first + np.arange(count)) % self.capacity
+        return self._data[indices]
+
+
+class MetricHistory:
+    """История одной метрики с постоянной памятью.
+
+    Уровень 0 хранит последние capacity значений. Каждый следующий уровень
+    хранит средние по factor точкам предыдущего, то есть охватывает в factor
+    раз больший промежуток с той же ёмкостью. Максимум и минимум за всё время
+    поддерживаются при добавлении.
+    """
+
+    def __init__(self, capacity: int = 600, factor: int = 10, levels: int = 3):
+        self.factor = factor
+        self.tiers: List[RingBuffer] = [RingBuffer(capacity) for _ in range(levels)]
+        # Незавершённые суммы для точек более грубых уровней
+        self._partial_sums = np.zeros(levels, dtype=np.float64)
+        self._partial_counts = np.zeros(levels, dtype=np.int64)
+        self.count = 0
+        self.max = -np.inf
+        self.min = np.inf
+        self.last = None
+
+    def __len__(self) -> int:
+        return self.count
+
+    def append(self, value: float):
+        value = float(value)
+        self.count += 1
+        self.last = value
+        self.max = max(self.max, value)
+        self.min = min(self.min, value)
+
+        # Значение передаётся вверх по уровням, пока не накопится полная точка
+        for level, tier in enumerate(self.tiers):
+            if level == 0:
+                tier.append(value)
+                continue
+            self._partial_sums[level] += value
+            self._partial_counts[level] += 1
+            if self._partial_counts[level] < self.factor:
+                break
+            value = self._partial_sums[level] / self.factor
+            tier.append(value)
+            self._partial_sums[level] = 0.0
+            self._partial_counts[level] = 0
+
+    def recent(self, count: int) -> np.ndarray:
+        """Последние count значений с полным разрешением"""
+        return self.tiers[0].values(count)
+
+    def level(self, level: int, count: Optional[int] = None) -> np.ndarray:
+        """Точки уровня level (среднее по factor**level значениям)"""
+        return self.tiers[level].values(count)
@@ -1,27 +1,80 @@
 import pygame
 import math
-import random
 from typing import Tuple, Optional, Dict
+import numpy as np
 from village_simulation.src.agent import VillageResident
+from village_simulation.game.sprite_manager import DIRECTIONS, SpriteManager
+
+
+def _column(name: str) -> property:
+    """Свойство, читающее и пишущее строку жителя в массиве менеджера"""
+    def getter(self):
+        return getattr(self._manager, name)[self._index].item()
+
+    def setter(self, value):
+        getattr(self._manager, name)[self._index] = value
+
+    return property(getter, setter)
+
 
 class VillagerSprite:
-    def __init__(self, agent: VillageResident, initial_position: Tuple[int, int]):
+    """Представление одного жителя поверх общего SpriteManager"""
+    
+    def __init__(self, agent: VillageResident, initial_position: Tuple[int, int],
+                 manager: Optional[SpriteManager] = None):
         self.agent = agent
-        self.position = list(initial_position)
-        self.target: Optional[Tuple[int, int]] = None
-        self.speed = 2
-        self.size = 16
         self.color = self._get_color_by_job()
         
-        # Анимация
-        self.animation_frame = 0
-        self.animation_speed = 0.2
-        self.direction = 'down'  # down, up, left, right
-        self.is_moving = False
-        
-        # Задержка между движениями
-        self.rest_timer = 0
-        self.rest_duration = random.randint(1000, 3000)  # 1-3 секунды
+        # Состояние движения и анимации хранится в массивах менеджера
+        self._manager = manager if manager is not None else SpriteManager(1)
+        self._index = self._manager.add(self, initial_position, size=16)
+    
+    @property
+    def position(self) -> np.ndarray:
+        return self._manager.positions[self._index]
+    
+    @position.setter
+    def position(self, value: Tuple[float, float]):
+        self._manager.positions[self._index] = value
+    
+    @property
+    def target(self) -> Optional[Tuple[float, float]]:
+        if not self._manager.has_target[self._index]:
+            return None
+        return tuple(self._manager.targets[self._index].tolist())
+    
+    @target.setter
+    def target(self, value: Optional[Tuple[float, float]]):
+        self._manager.has_target[self._index] = value is not None
+        if value is not None:
+            self._manager.targets[self._index] = value
+    
+    @property
+    def is_moving(self) -> bool:
+        return bool(self._manager.moving[self._index])
+    
+    @is_moving.setter
+    def is_moving(self, value: bool):
+        self._manager.moving[self._index] = value
+    
+    @property
+    def direction(self) -> str:
+        return DIRECTIONS[self._manager.directions[self._index]]
+    
+    @direction.setter
+    def direction(self, value: str):
+        self._manager.directions[self._index] = DIRECTIONS.index(value)
+    
+    size = _column('sizes')
+    speed = _column('speeds')
+    animation_frame = _column('animation_frames')
+    animation_speed = _column('animation_speeds')
+    rest_timer = _column('rest_timers')
+    rest_duration = _column('rest_durations')
+    
+    def bounds(self) -> pygame.Rect:
+        """Прямоугольник жителя на карте мира (как при отрисовке в VillageGame)"""
+        return pygame.Rect(int(self.position[0]), int(self.position[1]), self.size, self.size)
     
     def _get_color_by_job(self) -> Tuple[int, int, int]:
         """Определение цвета жителя на основе его работы"""
@@ -36,53 +89,11 @@ class VillagerSprite:
     
     def move_to(self, target: Tuple[int, int]):
         """Установка новой цели движения"""
-        self.target = target
-        self.is_moving = True
-        
-        # Определение направления движения
-        dx = target[0] - self.position[0]
-        dy = target[1] - self.position[1]
-        if abs(dx) > abs(dy):
-            self.direction = 'right' if dx > 0 else 'left'
-        else:
-            self.direction = 'down' if dy > 0 else 'up'
+        self._manager.move_many([self._index], [target])
     
     def update(self):
-        """Обновление позиции и состояния жителя"""
-        if self.target and self.is_moving:
-            # Вычисление вектора движения
-            dx = self.target[0] - self.position[0]
-            dy = self.target[1] - self.position[1]
-            distance = math.sqrt(dx * dx + dy * dy)
-            
-            if distance < self.speed:
-                self.position[0] = self.target[0]
-                self.position[1] = self.target[1]
-                self.target = None
-                self.is_moving = False
-                self.rest_timer = pygame.time.get_ticks()
-            else:
-                # Нормализация вектора движения
-                dx = dx / distance * self.speed
-                dy = dy / distance * self.speed
-                self.position[0] += dx
-                self.position[1] += dy
-                
-                # Обновление направления
-                if abs(dx) > abs(dy):
-                    self.direction = 'right' if dx > 0 else 'left'
-                else:
-                    self.direction = 'down' if dy > 0 else 'up'
-                
-                # Обновление кадра анимации
-                self.animation_frame += self.animation_speed
-                if self.animation_frame >= 4:
-                    self.animation_frame = 0
-        elif not self.target and not self.is_moving:
-            # Проверка времени отдыха
-            current_time = pygame.time.get_ticks()
-            if current_time - self.rest_timer >= self.rest_duration:
-                self.is_moving = True
+        """Обновление позиции и состояния жителя (для всех сразу - SpriteManager.step)"""
+        self._manager.step(indices=[self._index])
     
     def draw(self, screen):
         """Отрисовка жителя"""
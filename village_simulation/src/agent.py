@@ -1,8 +1,11 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, fields
 from typing import Dict, List, Optional
 import numpy as np
 from mesa import Agent
 
+from .agent_state import AgentState, CATEGORIES
+from .social import Relations, RelationView
+
 @dataclass
 class Demographics:
     age: int
@@ -24,7 +27,73 @@ class Skills:
     trading: float     # 0-1
     management: float  # 0-1
 
+def _column(name: str) -> property:
+    """Свойство, читающее и пишущее колонку AgentState для строки объекта"""
+    if name in CATEGORIES:
+        def getter(self):
+            return self._state.get(name, self._index)
+        
+        def setter(self, value):
+            self._state.set(name, self._index, value)
+    else:
+        # Числовые колонки читаются напрямую, без разбора категорий
+        def getter(self):
+            return getattr(self._state, name)[self._index].item()
+        
+        def setter(self, value):
+            self._state.set_value(name, self._index, value)
+    
+    return property(getter, setter)
+
+class _RowView:
+    """Представление строки AgentState с полями dataclass-значения _value_type.
+
+    Не наследует dataclass, поэтому у объекта нет __dict__ - только два слота.
+    """
+    __slots__ = ('_state', '_index')
+    
+    def __init__(self, state: AgentState, index: int):
+        self._state = state
+        self._index = index
+    
+    def __eq__(self, other):
+        if not isinstance(other, (self._value_type, type(self))):
+            return NotImplemented
+        return all(getattr(self, f.name) == getattr(other, f.name)
+                   for f in fields(self._value_type))
+    
+    def __repr__(self):
+        values = ", ".join(f"{f.name}={getattr(self, f.name)!r}" for f in fields(self._value_type))
+        return f"{self._value_type.__name__}({values})"
+
+class DemographicsView(_RowView):
+    __slots__ = ()
+    _value_type = Demographics
+    age = _column('age')
+    gender = _column('gender')
+    marital_status = _column('marital_status')
+    education_level = _column('education_level')
+
+class PersonalityView(_RowView):
+    __slots__ = ()
+    _value_type = Personality
+    sociability = _column('sociability')
+    diligence = _column('diligence')
+    ambition = _column('ambition')
+    risk_tolerance = _column('risk_tolerance')
+
+class SkillsView(_RowView):
+    __slots__ = ()
+    _value_type = Skills
+    agriculture = _column('agriculture')
+    crafts = _column('crafts')
+    trading = _column('trading')
+    management = _column('management')
+
 class VillageResident(Agent):
+    # Все признаки и состояние жителя хранятся в массивах AgentState модели,
+    # объект жителя - лишь представление своей строки
+    
     def __init__(
         self,
         unique_id: int,
@@ -34,26 +103,117 @@ class VillageResident(Agent):
         skills: Skills
     ):
         super().__init__(unique_id, model)
+        state = getattr(model, 'agent_state', None)
+        self._attach(state if state is not None else AgentState(1))
         self.demographics = demographics
         self.personality = personality
         self.skills = skills
+    
+    @classmethod
+    def from_state(cls, unique_id: int, model, index: int) -> 'VillageResident':
+        """Житель поверх уже заполненной строки model.agent_state"""
+        agent = cls.__new__(cls)
+        Agent.__init__(agent, unique_id, model)
+        agent._attach(model.agent_state, index)
+        return agent
+    
+    def _attach(self, state: AgentState, index: Optional[int] = None):
+        """Привязка к строке хранилища состояния"""
+        self._state = state
+        self._index = state.add() if index is None else index
         
-        # Социальные связи
-        self.family: List[int] = []  # ID членов семьи
-        self.friends: List[int] = []  # ID друзей
-        self.colleagues: List[int] = []  # ID коллег
-        self.neighbors: List[int] = []  # ID соседей
-        
-        # Экономические показатели
-        self.wealth: float = 0.0
-        self.income: float = 0.0
-        self.job: Optional[str] = None
-        self.owned_resources: Dict[str, float] = {}
+        # Социальные связи (ID жителей) хранятся в индексах связей модели
+        relations = getattr(self.model, 'relations', None)
+        self._relations: Relations = relations if relations is not None else Relations()
         
-        # Состояние
-        self.health: float = 1.0  # 0-1
-        self.happiness: float = 0.5  # 0-1
-        self.energy: float = 1.0  # 0-1
+        # Словарь ресурсов создаётся при первом обращении
+        self._owned_resources: Optional[Dict[str, float]] = None
+    
+    @property
+    def row(self) -> int:
+        """Индекс строки жителя в хранилище состояния"""
+        return self._index
+    
+    @property
+    def demographics(self) -> DemographicsView:
+        return DemographicsView(self._state, self._index)
+    
+    @demographics.setter
+    def demographics(self, value: Demographics):
+        self._write_fields(value)
+    
+    @property
+    def personality(self) -> PersonalityView:
+        return PersonalityView(self._state, self._index)
+    
+    @personality.setter
+    def personality(self, value: Personality):
+        self._write_fields(value)
+    
+    @property
+    def skills(self) -> SkillsView:
+        return SkillsView(self._state, self._index)
+    
+    @skills.setter
+    def skills(self, value: Skills):
+        self._write_fields(value)
+    
+    def _write_fields(self, value):
+        """Запись полей dataclass-значения в строку хранилища"""
+        for f in fields(value):
+            self._state.set(f.name, self._index, getattr(value, f.name))
+    
+    @property
+    def family(self) -> RelationView:  # ID членов семьи
+        return RelationView(self._relations.family, self.unique_id)
+    
+    @family.setter
+    def family(self, value: List[int]):
+        self._relations.family.set_row(self.unique_id, value)
+    
+    @property
+    def friends(self) -> RelationView:  # ID друзей
+        return RelationView(self._relations.friends, self.unique_id)
+    
+    @friends.setter
+    def friends(self, value: List[int]):
+        self._relations.friends.set_row(self.unique_id, value)
+    
+    @property
+    def colleagues(self) -> RelationView:  # ID коллег
+        return RelationView(self._relations.colleagues, self.unique_id)
+    
+    @colleagues.setter
+    def colleagues(self, value: List[int]):
+        self._relations.colleagues.set_row(self.unique_id, value)
+    
+    @property
+    def neighbors(self) -> RelationView:  # ID соседей
+        return RelationView(self._relations.neighbors, self.unique_id)
+    
+    @neighbors.setter
+    def neighbors(self, value: List[int]):
+        self._relations.neighbors.set_row(self.unique_id, value)
+    
+    @property
+    def owned_resources(self) -> Dict[str, float]:
+        if self._owned_resources is None:
+            self._owned_resources = {}
+        return self._owned_resources
+    
+    @owned_resources.setter
+    def owned_resources(self, value: Dict[str, float]):
+        self._owned_resources = value
+    
+    # Экономические показатели
+    wealth = _column('wealth')
+    income = _column('income')
+    job = _column('job')
+    
+    # Состояние (0-1)
+    health = _column('health')
+    happiness = _column('happiness')
+    energy = _column('energy')
         
     def step(self):
         """Ежедневные действия агента"""
@@ -104,8 +264,8 @@ class VillageResident(Agent):
         """Расчет социального статуса"""
         # Простая формула для демонстрации
         return (
-            len(self.family) * 0.2 +
-            len(self.friends) * 0.1 +
+            self._relations.family.degree(self.unique_id) * 0.2 +
+            self._relations.friends.degree(self.unique_id) * 0.1 +
             self.wealth * 0.3 +
-            max(self.skills.__dict__.values()) * 0.4
+            max(getattr(self.skills, f.name) for f in fields(Skills)) * 0.4
         ) 
@@ -0,0 +1,160 @@
+from typing import Any, Dict, List, Tuple
+import numpy as np
+
+# Колонки состояния жителей: имя -> (тип, значение по умолчанию)
+STATE_COLUMNS: Dict[str, Tuple[type, float]] = {
+    'energy': (np.float64, 1.0),
+    'health': (np.float64, 1.0),
+    'happiness': (np.float64, 0.5),
+    'wealth': (np.float64, 0.0),
+    'income': (np.float64, 0.0),
+    'job': (np.int16, 0),  # код работы, 0 - безработный
+    # Демография
+    'age': (np.int16, 0),
+    'gender': (np.int8, 0),
+    'marital_status': (np.int8, 0),
+    'education_level': (np.int8, 0),
+    # Личность
+    'sociability': (np.float64, 0.0),
+    'diligence': (np.float64, 0.0),
+    'ambition': (np.float64, 0.0),
+    'risk_tolerance': (np.float64, 0.0),
+    # Навыки
+    'agriculture': (np.float64, 0.0),
+    'crafts': (np.float64, 0.0),
+    'trading': (np.float64, 0.0),
+    'management': (np.float64, 0.0),
+}
+
+# Категориальные колонки хранятся кодами; известные значения получают
+# фиксированные коды, новые регистрируются при первом появлении
+CATEGORIES: Dict[str, Tuple[Any, ...]] = {
+    'job': (None, 'farmer', 'craftsman', 'trader', 'manager'),
+    'gender': ('M', 'F'),
+    'marital_status': ('single', 'married', 'widowed'),
+    'education_level': ('none', 'basic', 'advanced'),
+}
+
+
+# Колонки, для которых поддерживаются текущие суммы по всем жителям
+TRACKED_COLUMNS: Tuple[str, ...] = ('wealth', 'happiness')
+
+# Остаток текущей суммы меньше TOTAL_EPS на жителя считается ошибкой
+# округления и обнуляется (сумма неотрицательных колонок, ставшая нулём)
+TOTAL_EPS = 1e-9
+
+
+class AgentState:
+    """Состояние всех жителей в виде массивов NumPy (structure-of-arrays)"""
+
+    def __init__(self, capacity: int = 0):
+        self.size = 0
+        self.capacity = max(0, capacity)
+        self.labels: Dict[str, List[Any]] = {
+            column: list(values) for column, values in CATEGORIES.items()
+        }
+        self._codes: Dict[str, Dict[Any, int]] = {
+            column: {value: code for code, value in enumerate(values)}
+            for column, values in CATEGORIES.items()
+        }
+
+        for name, (dtype, default) in STATE_COLUMNS.items():
+            setattr(self, name, np.full(self.capacity, default, dtype=dtype))
+
+        # Текущие суммы; их обновляет код, изменяющий колонки
+        self.totals: Dict[str, float] = {column: 0.0 for column in TRACKED_COLUMNS}
+
+    def add(self) -> int:
+        """Выделение строки под нового жителя, возвращает его индекс"""
+        return int(self.add_many(1)[0])
+
+    def add_many(self, count: int) -> np.ndarray:
+        """Выделение строк сразу под несколько жителей"""
+        if self.size + count > self.capacity:
+            self._grow(max(16, self.capacity * 2, self.size + count))
+        indices = np.arange(self.size, self.size + count)
+        self.size += count
+        for column in TRACKED_COLUMNS:
+            self.add_to_total(column, STATE_COLUMNS[column][1] * count)
+        return indices
+
+    def add_to_total(self, column: str, delta: float):
+        """Изменение текущей суммы колонки на delta"""
+        total = self.totals[column] + float(delta)
+        if abs(total) < TOTAL_EPS * max(1, self.size):
+            total = 0.0
+        self.totals[column] = total
+
+    def set_value(self, column: str, index: int, value: float):
+        """Запись числового значения с обновлением текущей суммы"""
+        values = getattr(self, column)
+        if column in self.totals:
+            self.add_to_total(column, value - values[index])
+        values[index] = value
+
+    def verify_totals(self) -> Dict[str, float]:
+        """Полный пересчёт сумм; возвращает расхождение и сбрасывает его"""
+        drift = {}
+        for column in TRACKED_COLUMNS:
+            exact = float(getattr(self, column)[:self.size].sum())
+            drift[column] = self.totals[column] - exact
+            self.totals[column] = exact
+        return drift
+
+    def _grow(self, new_capacity: int):
+        """Увеличение ёмкости всех колонок"""
+        for name, (dtype, default) in STATE_COLUMNS.items():
+            old = getattr(self, name)
+            new = np.full(new_capacity, default, dtype=dtype)
+            new[:self.size] = old[:self.size]
+            setattr(self, name, new)
+        self.capacity = new_capacity
+
+    def code(self, column: str, value: Any) -> int:
+        """Код значения категориальной колонки (новые значения регистрируются)"""
+        codes = self._codes[column]
+        code = codes.get(value)
+        if code is None:
+            code = len(self.labels[column])
+            self.labels[column].append(value)
+            codes[value] = code
+        return code
+
+    def label(self, column: str, code: int) -> Any:
+        """Значение категориальной колонки по коду"""
+        return self.labels[column][code]
+
+    def get(self, column: str, index: int) -> Any:
+        """Значение колонки для одного жителя в виде объекта Python"""
+        value = getattr(self, column)[index]
+        if column in self._codes:
+            return self.labels[column][value]
+        return value.item()
+
+    def set(self, column: str, index: int, value: Any):
+        """Запись значения колонки для одного жителя"""
+        if column in self._codes:
+            value = self.code(column, value)
+        self.set_value(column, index, value)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Копия заполненных строк всех колонок и служебных данных"""
+        return {
+            'size': self.size,
+            'columns': {name: getattr(self, name)[:self.size].copy() for name in STATE_COLUMNS},
+            'labels': {column: list(values) for column, values in self.labels.items()},
+            'totals': dict(self.totals),
+        }
+
+    @classmethod
+    def from_snapshot(cls, snapshot: Dict[str, Any]) -> 'AgentState':
+        """Восстановление хранилища из snapshot()"""
+        state = cls(snapshot['size'])
+        state.size = snapshot['size']
+        for name, values in snapshot['columns'].items():
+            getattr(state, name)[:state.size] = values
+        for column, values in snapshot['labels'].items():
+            state.labels[column] = list(values)
+            state._codes[column] = {value: code for code, value in enumerate(values)}
+        state.totals = dict(snapshot['totals'])
+        return state
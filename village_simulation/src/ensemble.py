@@ -0,0 +1,126 @@
+"""
+Ансамблевый (Монте-Карло) запуск VillageModel на пуле процессов.
+
+Реплики с разными детерминированными сидами и наборами параметров
+выполняются в постоянных рабочих процессах (импорты загружаются один раз
+на процесс), а их статистика по мере готовности сводится в EnsembleStore
+со средним и квантилями по дням.
+"""
+import random
+from datetime import datetime
+from multiprocessing import Pool
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+from tqdm import tqdm
+
+from .run_simulation import collect_stats
+from .village_model import VillageModel
+
+# Метрики, собираемые с каждой реплики
+METRICS = ('population', 'total_wealth', 'average_happiness')
+
+
+def replica_seeds(base_seed: int, count: int) -> List[int]:
+    """Независимые детерминированные сиды реплик"""
+    children = np.random.SeedSequence(base_seed).spawn(count)
+    return [int(child.generate_state(1)[0]) for child in children]
+
+
+def _run_replica(task: Tuple[int, int, int, Dict[str, Any], int, int]):
+    """Запуск одной реплики в рабочем процессе"""
+    param_index, replica, seed, params, days, save_frequency = task
+
+    # Модель использует глобальные генераторы random и np.random
+    random.seed(seed)
+    np.random.seed(seed)
+    model = VillageModel(seed=seed, start_date=datetime(2025, 1, 1), **params)
+
+    sample_days = list(range(0, days, save_frequency))
+    values = np.empty((len(METRICS), len(sample_days)))
+    sample = 0
+    for day in range(days):
+        model.step()
+        if day % save_frequency == 0:
+            row = collect_stats(model, day)
+            values[:, sample] = [row[metric] for metric in METRICS]
+            sample += 1
+    return param_index, replica, values
+
+
+class EnsembleStore:
+    """Сводное хранилище статистики реплик по наборам параметров"""
+
+    def __init__(self, param_sets: Sequence[Dict[str, Any]], replicas: int, sample_days: Sequence[int]):
+        self.param_sets = list(param_sets)
+        self.sample_days = np.asarray(sample_days)
+        # values[набор][метрика, реплика, день]
+        self.values = [
+            np.full((len(METRICS), replicas, len(sample_days)), np.nan)
+            for _ in self.param_sets
+        ]
+        self.completed = 0
+
+    def add(self, param_index: int, replica: int, values: np.ndarray):
+        """Запись результатов одной реплики"""
+        self.values[param_index][:, replica, :] = values
+        self.completed += 1
+
+    def summary(self, quantiles: Sequence[float] = (0.05, 0.5, 0.95)) -> pd.DataFrame:
+        """Среднее и квантили каждой метрики по дням"""
+        frames = []
+        for param_index, values in enumerate(self.values):
+            frame = {'param_set': param_index, 'day': self.sample_days}
+            for metric_index, metric in enumerate(METRICS):
+                metric_values = values[metric_index]
+                if np.isnan(metric_values).all():
+                    continue
+                frame[f'{metric}_mean'] = np.nanmean(metric_values, axis=0)
+                for q, row in zip(quantiles, np.nanquantile(metric_values, quantiles, axis=0)):
+                    frame[f'{metric}_q{int(round(q * 100)):02d}'] = row
+            frames.append(pd.DataFrame(frame))
+        return pd.concat(frames, ignore_index=True)
+
+
+def run_ensemble(
+    replicas: int = 100,
+    param_sets: Optional[Sequence[Dict[str, Any]]] = None,
+    years: int = 1,
+    save_frequency: int = 7,
+    base_seed: int = 0,
+    processes: Optional[int] = None,
+    quantiles: Sequence[float] = (0.05, 0.5, 0.95),
+    output_dir: Optional[str] = "data/ensemble_results"
+) -> pd.DataFrame:
+    """Запуск replicas реплик для каждого набора параметров VillageModel"""
+    param_sets = [dict(params) for params in param_sets] if param_sets else [{'num_agents': 200, 'vectorized': True}]
+    days = years * 365
+    for params in param_sets:
+        params.setdefault('simulation_years', years)
+
+    store = EnsembleStore(param_sets, replicas, range(0, days, save_frequency))
+    seeds = replica_seeds(base_seed, len(param_sets) * replicas)
+    tasks = [
+        (param_index, replica, seeds[param_index * replicas + replica], params, days, save_frequency)
+        for param_index, params in enumerate(param_sets)
+        for replica in range(replicas)
+    ]
+
+    # Результаты поступают по мере готовности, порядок не важен
+    with Pool(processes) as pool:
+        with tqdm(total=len(tasks), desc="Ансамбль") as pbar:
+            for param_index, replica, values in pool.imap_unordered(_run_replica, tasks):
+                store.add(param_index, replica, values)
+                pbar.update(1)
+
+    summary = store.summary(quantiles)
+    if output_dir:
+        output_path = Path(output_dir)
+        output_path.mkdir(parents=True, exist_ok=True)
+        summary.to_csv(output_path / 'ensemble_summary.csv', index=False)
+    return summary
+
+
+if __name__ == "__main__":
+    run_ensemble()
@@ -0,0 +1,123 @@
+"""
+Потоковая запись статистики симуляции.
+
+Строки фиксированной схемы (STATS_DTYPE) дописываются в бинарный файл
+порциями по мере выполнения прогона, поэтому память не растёт с длиной
+прогона, а при аварийном завершении сохраняются все записанные порции.
+Файл читается без загрузки в память через np.memmap (read_stats).
+"""
+import json
+from pathlib import Path
+from typing import Dict, List, Sequence, Union
+import numpy as np
+import pandas as pd
+
+# Схема строки статистики
+STATS_DTYPE = np.dtype([
+    ('day', '<i4'),
+    ('date', '<M8[D]'),
+    ('population', '<i8'),
+    ('total_wealth', '<f8'),
+    ('average_happiness', '<f8'),
+])
+
+
+def _schema_path(path: Path) -> Path:
+    return path.with_name(path.name + '.schema.json')
+
+
+class StatsWriter:
+    """Порционная запись строк статистики в бинарный файл"""
+
+    def __init__(self, path: Union[str, Path], chunk_size: int = 32, append: bool = False):
+        self.path = Path(path)
+        self.chunk_size = max(1, chunk_size)
+        self._buffer = np.zeros(self.chunk_size, dtype=STATS_DTYPE)
+        self._pending = 0
+        self.rows_written = 0
+
+        # Описание схемы рядом с данными, чтобы файл можно было отобразить в память
+        with open(_schema_path(self.path), 'w', encoding='utf-8') as f:
+            json.dump({'dtype': STATS_DTYPE.descr}, f)
+
+        if append and self.path.exists():
+            # Незавершённая последняя запись (после сбоя) отбрасывается
+            self.rows_written = self.path.stat().st_size // STATS_DTYPE.itemsize
+            with open(self.path, 'r+b') as f:
+                f.truncate(self.rows_written * STATS_DTYPE.itemsize)
+        self._file = open(self.path, 'ab' if append else 'wb')
+
+    def append(self, row: Dict):
+        """Добавление строки (словарь с полями STATS_DTYPE)"""
+        self._buffer[self._pending] = tuple(row[name] for name in STATS_DTYPE.names)
+        self._pending += 1
+        if self._pending == self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        """Сброс накопленной порции на диск"""
+        if self._pending:
+            self._file.write(self._buffer[:self._pending].tobytes())
+            self.rows_written += self._pending
+            self._pending = 0
+        self._file.flush()
+
+    def truncate(self, rows: int):
+        """Обрезка файла до первых rows строк (при продолжении с контрольной точки)"""
+        self.flush()
+        rows = min(rows, self.rows_written)
+        self._file.truncate(rows * STATS_DTYPE.itemsize)
+        self.rows_written = rows
+
+    def close(self):
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+    def __enter__(self) -> 'StatsWriter':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_stats(path: Union[str, Path]) -> np.ndarray:
+    """Статистика из файла StatsWriter в виде структурного массива (memmap)"""
+    path = Path(path)
+    rows = path.stat().st_size // STATS_DTYPE.itemsize
+    if rows == 0:
+        return np.zeros(0, dtype=STATS_DTYPE)
+    return np.memmap(path, dtype=STATS_DTYPE, mode='r', shape=(rows,))
+
+
+def records(stats: np.ndarray) -> List[Dict]:
+    """Строки статистики в виде списка словарей (дата - строка YYYY-MM-DD)"""
+    rows = []
+    for row in stats.tolist():
+        row = dict(zip(STATS_DTYPE.names, row))
+        row['date'] = row['date'].strftime('%Y-%m-%d')
+        rows.append(row)
+    return rows
+
+
+def export_csv(rows: Union[Sequence[Dict], np.ndarray], path: Union[str, Path]):
+    """Выгрузка статистики в CSV"""
+    pd.DataFrame(rows).to_csv(path, index=False)
+
+
+def export_json(rows: Union[Sequence[Dict], np.ndarray], path: Union[str, Path]):
+    """Выгрузка статистики в компактный JSON"""
+    frame = pd.DataFrame(rows)
+    if pd.api.types.is_datetime64_any_dtype(frame['date']):
+        frame['date'] = frame['date'].dt.strftime('%Y-%m-%d')
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(
+            {
+                'daily_stats': frame.to_dict(orient='records'),
+                'weekly_stats': [],
+                'monthly_stats': []
+            },
+            f,
+            ensure_ascii=False,
+            separators=(',', ':')
+        )
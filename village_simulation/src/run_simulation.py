@@ -1,73 +1,125 @@
-import json
 from datetime import datetime
 from pathlib import Path
+from typing import Optional
 import pandas as pd
 import matplotlib.pyplot as plt
 from tqdm import tqdm
 
+from .results import StatsWriter, read_stats, records, export_csv as write_csv, export_json as write_json
 from .village_model import VillageModel
 
 def run_simulation(
     output_dir: str = "data/simulation_results",
     num_agents: int = 200,
     years: int = 10,
-    save_frequency: int = 7  # сохранять данные каждые N дней
+    save_frequency: int = 7,  # сохранять данные каждые N дней
+    vectorized: bool = False,  # пакетный шаг модели над массивами
+    expected_degree: Optional[float] = None,  # среднее число начальных связей жителя
+    chunk_size: int = 32,  # строк статистики в одной порции записи
+    export_csv: bool = True,
+    export_json: bool = True,
+    checkpoint_every: Optional[int] = None,  # контрольная точка каждые N дней
+    resume: bool = False,  # продолжить с последней контрольной точки
+    seed: Optional[int] = None,
+    as_records: bool = False  # daily_stats списком словарей вместо memmap
 ):
     # Создание директории для результатов
     output_path = Path(output_dir)
     output_path.mkdir(parents=True, exist_ok=True)
     
-    # Инициализация модели
-    model = VillageModel(
-        num_agents=num_agents,
-        start_date=datetime(2025, 1, 1),
-        simulation_years=years
-    )
+    checkpoint_path = output_path / 'checkpoint.pkl'
+    stats_path = output_path / 'daily_statistics.bin'
     
-    # Подготовка структур данных для хранения результатов
-    results = {
-        'daily_stats': [],
-        'weekly_stats': [],
-        'monthly_stats': []
+    # Параметры прогона; продолжать можно только контрольную точку с теми же
+    params = {
+        'num_agents': num_agents,
+        'years': years,
+        'save_frequency': save_frequency,
+        'vectorized': vectorized,
+        'expected_degree': expected_degree,
+        'seed': seed,
     }
     
-    # Запуск симуляции
+    # Инициализация модели (или восстановление с контрольной точки)
+    start_day = 0
+    if resume and checkpoint_path.exists():
+        model, extra = VillageModel.load_checkpoint(checkpoint_path)
+        if extra.get('params') != params:
+            raise ValueError(
+                f"Контрольная точка {checkpoint_path} сохранена с другими параметрами "
+                f"({extra.get('params')}), ожидались {params}; удалите её или запустите без resume"
+            )
+        start_day = extra['day']
+    else:
+        model = VillageModel(
+            num_agents=num_agents,
+            start_date=datetime(2025, 1, 1),
+            simulation_years=years,
+            seed=seed,
+            vectorized=vectorized,
+            expected_degree=expected_degree
+        )
+    
+    # Запуск симуляции; статистика пишется на диск порциями по ходу прогона
     days = years * 365
-    with tqdm(total=days, desc="Симуляция") as pbar:
-        for day in range(days):
+    with StatsWriter(stats_path, chunk_size=chunk_size, append=start_day > 0) as writer, \
+            tqdm(total=days, initial=start_day, desc="Симуляция") as pbar:
+        # Строки, записанные после контрольной точки, будут посчитаны заново
+        writer.truncate(-(-start_day // save_frequency))
+        
+        for day in range(start_day, days):
             # Выполнение шага симуляции
             model.step()
             
             # Сохранение результатов
             if day % save_frequency == 0:
-                stats = model.get_statistics()
-                results['daily_stats'].append({
-                    'day': day,
-                    'date': stats['date'].strftime('%Y-%m-%d'),
-                    'population': stats['population'],
-                    'total_wealth': stats['economy']['total_wealth'],
-                    'average_happiness': stats['social_metrics']['average_happiness']
-                })
+                writer.append(collect_stats(model, day))
+            
+            # Контрольная точка: статистика сбрасывается на диск до неё
+            if checkpoint_every and (day + 1) % checkpoint_every == 0:
+                writer.flush()
+                model.save_checkpoint(checkpoint_path, extra={'day': day + 1, 'params': params})
             
             pbar.update(1)
     
+    # Прогон завершён и статистика записана - продолжать больше нечего
+    checkpoint_path.unlink(missing_ok=True)
+    
+    # Выгрузка и графики строятся прямо по файлу статистики (memmap)
+    stats = {'daily_stats': read_stats(stats_path)}
+    
     # Сохранение результатов
-    save_results(results, output_path)
+    save_results(stats, output_path, export_csv=export_csv, export_json=export_json)
     
     # Создание визуализаций
-    create_visualizations(results, output_path)
+    create_visualizations(stats, output_path)
     
-    return results
+    # По умолчанию daily_stats - memmap над daily_statistics.bin (память не
+    # растёт с длиной прогона); as_records=True - прежний список словарей
+    daily_stats = stats['daily_stats']
+    return {
+        'daily_stats': records(daily_stats) if as_records else daily_stats,
+        'weekly_stats': [],
+        'monthly_stats': []
+    }
 
-def save_results(results: dict, output_path: Path):
-    """Сохранение результатов в файлы"""
-    # Сохранение ежедневной статистики
-    daily_df = pd.DataFrame(results['daily_stats'])
-    daily_df.to_csv(output_path / 'daily_statistics.csv', index=False)
-    
-    # Сохранение сырых данных
-    with open(output_path / 'raw_results.json', 'w', encoding='utf-8') as f:
-        json.dump(results, f, ensure_ascii=False, indent=2, default=str)
+def collect_stats(model: VillageModel, day: int) -> dict:
+    """Строка статистики модели за день"""
+    stats = model.get_statistics()
+    return {
+        'day': day,
+        'date': stats['date'].strftime('%Y-%m-%d'),
+        'population': stats['population'],
+        'total_wealth': stats['economy']['total_wealth'],
+        'average_happiness': stats['social_metrics']['average_happiness']
+    }
+
+def save_results(results: dict, output_path: Path, export_csv: bool = True, export_json: bool = True):
+    """Выгрузка результатов в CSV/JSON (основные данные уже в daily_statistics.bin)"""
+    if export_csv:
+        write_csv(results['daily_stats'], output_path / 'daily_statistics.csv')
+    if export_json:
+        write_json(results['daily_stats'], output_path / 'raw_results.json')
 
 def create_visualizations(results: dict, output_path: Path):
     """Создание визуализаций результатов"""
@@ -0,0 +1,295 @@
+from typing import Dict, Iterable, Iterator, Optional, Set, Tuple
+import numpy as np
+
+
+def sample_initial_links(connection_probability: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Выборка начальных связей без перебора всех пар.
+
+    Каждый агент i связан с каждым другим агентом независимо с вероятностью
+    connection_probability[i]. Вместо N*(N-1) испытаний число связей агента
+    берётся из биномиального распределения, а партнёры выбираются напрямую
+    (равномерно, без повторов и без самого агента).
+
+    Возвращает массивы (src, dst), упорядоченные по src, затем по dst.
+    """
+    n = len(connection_probability)
+    if n < 2:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty.copy()
+
+    degrees = np.random.binomial(n - 1, connection_probability)
+    pending = np.repeat(np.arange(n, dtype=np.int64), degrees)
+
+    # Партнёры выбираются пачками; совпавшие перевыбираются, пока у каждого
+    # агента все партнёры не станут различными. Связь кодируется ключом src*n+dst.
+    # Принятые ключи лежат в отсортированных кусках убывающего размера: новый
+    # кусок сливается с предыдущим, пока тот не станет вдвое больше, так что
+    # кусков O(log E) и проверка одного раунда не зависит от числа раундов.
+    accepted = []
+    while len(pending):
+        # Сдвиг исключает самого агента из выбора
+        candidates = np.random.randint(0, n - 1, len(pending))
+        candidates += candidates >= pending
+        keys = pending * n + candidates
+
+        known = np.zeros(len(keys), dtype=bool)
+        for chunk in accepted:
+            index = np.minimum(np.searchsorted(chunk, keys), len(chunk) - 1)
+            known |= chunk[index] == keys
+
+        fresh, first = np.unique(keys[~known], return_index=True)
+        if len(fresh):
+            accepted.append(fresh)
+            while len(accepted) > 1 and len(accepted[-2]) <= 2 * len(accepted[-1]):
+                last = accepted.pop()
+                # Слияние двух отсортированных кусков (timsort находит оба отрезка)
+                accepted[-1] = np.sort(np.concatenate((accepted[-1], last)), kind='stable')
+        retry = np.ones(len(keys), dtype=bool)
+        retry[np.flatnonzero(~known)[first]] = False
+        pending = pending[retry]
+
+    keys = np.sort(np.concatenate(accepted)) if accepted else np.empty(0, dtype=np.int64)
+    return keys // n, keys % n
+
+
+# Типы связей жителей
+RELATION_TYPES = ('family', 'friends', 'colleagues', 'neighbors')
+
+
+class RelationIndex:
+    """Направленные связи одного типа между жителями (по ID).
+
+    Для обхода связи хранятся в CSR-массивах (indptr, indices) с
+    отсортированными партнёрами внутри строки. Для проверки принадлежности
+    строка при первом обращении превращается в хеш-множество; изменения
+    пишутся в эти множества, а CSR пересобирается лениво при следующем обходе.
+    """
+
+    def __init__(self, size: int = 0):
+        self.size = size
+        self._indptr = np.zeros(size + 1, dtype=np.int64)
+        self._indices = np.empty(0, dtype=np.int64)
+        self._sets: Dict[int, Set[int]] = {}
+        self._modified: Set[int] = set()
+        # Отсортированные ключи node*size+other для пакетной проверки
+        self._keys: Optional[np.ndarray] = None
+
+    @classmethod
+    def from_pairs(cls, size: int, src: np.ndarray, dst: np.ndarray) -> 'RelationIndex':
+        """Построение из пар, упорядоченных по src, затем по dst"""
+        index = cls(size)
+        index._indptr = np.searchsorted(src, np.arange(size + 1)).astype(np.int64)
+        index._indices = np.asarray(dst, dtype=np.int64)
+        return index
+
+    @classmethod
+    def from_csr(cls, indptr: np.ndarray, indices: np.ndarray) -> 'RelationIndex':
+        """Построение из готовых CSR-массивов (см. csr())"""
+        index = cls(len(indptr) - 1)
+        index._indptr = np.array(indptr, dtype=np.int64)
+        index._indices = np.array(indices, dtype=np.int64)
+        return index
+
+    def _ensure_size(self, node: int):
+        """Расширение индекса под новые ID"""
+        if node >= self.size:
+            tail = np.full(node + 1 - self.size, self._indptr[-1], dtype=np.int64)
+            self._indptr = np.concatenate([self._indptr, tail])
+            self.size = node + 1
+            self._keys = None
+
+    def _row_set(self, node: int) -> Set[int]:
+        """Хеш-множество партнёров строки (создаётся при первом обращении)"""
+        row = self._sets.get(node)
+        if row is None:
+            if node < self.size:
+                row = set(self._indices[self._indptr[node]:self._indptr[node + 1]].tolist())
+            else:
+                row = set()
+            self._sets[node] = row
+        return row
+
+    def has(self, node: int, other: int) -> bool:
+        """Есть ли связь node -> other (O(1))"""
+        row = self._sets.get(node)
+        if row is None:
+            if node >= self.size or self._indptr[node] == self._indptr[node + 1]:
+                return False
+            row = self._row_set(node)
+        return other in row
+
+    def add(self, node: int, other: int) -> bool:
+        """Добавление связи node -> other; False, если она уже была"""
+        row = self._row_set(node)
+        if other in row:
+            return False
+        self._ensure_size(max(node, other))
+        row.add(other)
+        self._modified.add(node)
+        return True
+
+    def remove(self, node: int, other: int) -> bool:
+        """Удаление связи node -> other; False, если её не было"""
+        row = self._row_set(node)
+        if other not in row:
+            return False
+        row.remove(other)
+        self._modified.add(node)
+        return True
+
+    def set_row(self, node: int, others: Iterable[int]):
+        """Замена всех партнёров строки"""
+        others = set(others)
+        self._ensure_size(max([node, *others]))
+        self._sets[node] = others
+        self._modified.add(node)
+
+    def degree(self, node: int) -> int:
+        """Число партнёров node"""
+        row = self._sets.get(node)
+        if row is not None:
+            return len(row)
+        if node >= self.size:
+            return 0
+        return int(self._indptr[node + 1] - self._indptr[node])
+
+    def neighbors(self, node: int) -> np.ndarray:
+        """Отсортированные партнёры node"""
+        if node in self._modified:
+            return np.array(sorted(self._sets[node]), dtype=np.int64)
+        if node >= self.size:
+            return np.empty(0, dtype=np.int64)
+        return self._indices[self._indptr[node]:self._indptr[node + 1]]
+
+    def csr(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Массивы (indptr, indices) со всеми изменениями"""
+        self._compact()
+        return self._indptr, self._indices
+
+    def _compact(self):
+        """Перенос изменённых строк из множеств в CSR"""
+        if not self._modified:
+            return
+        old_indptr, old_indices = self._indptr, self._indices
+        degrees = np.diff(old_indptr)
+        modified = np.zeros(self.size, dtype=bool)
+        rows = np.fromiter(self._modified, dtype=np.int64, count=len(self._modified))
+        modified[rows] = True
+        degrees[rows] = [len(self._sets[row]) for row in rows.tolist()]
+
+        indptr = np.zeros(self.size + 1, dtype=np.int64)
+        np.cumsum(degrees, out=indptr[1:])
+        indices = np.empty(indptr[-1], dtype=np.int64)
+
+        # Неизменённые строки переносятся одной операцией
+        owners = np.repeat(np.arange(len(old_indptr) - 1), np.diff(old_indptr))
+        keep = ~modified[owners]
+        offsets = np.arange(len(old_indices))[keep] - old_indptr[owners[keep]]
+        indices[indptr[owners[keep]] + offsets] = old_indices[keep]
+
+        for row in rows.tolist():
+            indices[indptr[row]:indptr[row + 1]] = sorted(self._sets[row])
+
+        self._indptr, self._indices = indptr, indices
+        self._modified.clear()
+        self._keys = None
+
+    def _edge_keys(self) -> np.ndarray:
+        """Отсортированные ключи всех связей"""
+        self._compact()
+        if self._keys is None:
+            owners = np.repeat(np.arange(self.size, dtype=np.int64), np.diff(self._indptr))
+            self._keys = owners * self.size + self._indices
+        return self._keys
+
+    def has_many(self, nodes: np.ndarray, others: np.ndarray) -> np.ndarray:
+        """Пакетная проверка связей nodes[k] -> others[k]"""
+        nodes = np.asarray(nodes, dtype=np.int64)
+        others = np.asarray(others, dtype=np.int64)
+        keys = self._edge_keys()
+        inside = (nodes < self.size) & (others < self.size)
+        if not len(keys):
+            return np.zeros(len(nodes), dtype=bool)
+        query = np.where(inside, nodes * self.size + others, -1)
+        position = np.minimum(np.searchsorted(keys, query), len(keys) - 1)
+        return inside & (keys[position] == query)
+
+    def add_many(self, nodes: np.ndarray, others: np.ndarray):
+        """Пакетное добавление связей nodes[k] -> others[k]"""
+        nodes = np.asarray(nodes, dtype=np.int64)
+        others = np.asarray(others, dtype=np.int64)
+        if not len(nodes):
+            return
+        self._ensure_size(int(max(nodes.max(), others.max())))
+        keys = np.union1d(self._edge_keys(), nodes * self.size + others)
+        owners = keys // self.size
+        self._indptr = np.searchsorted(owners, np.arange(self.size + 1)).astype(np.int64)
+        self._indices = keys % self.size
+        self._keys = keys
+
+        # Уже созданные хеш-множества строк обновляются вместе с CSR
+        for node, other in zip(nodes.tolist(), others.tolist()):
+            row = self._sets.get(node)
+            if row is not None:
+                row.add(other)
+
+
+class Relations:
+    """Хранилище связей жителя по типам (family, friends, colleagues, neighbors)"""
+
+    def __init__(self, size: int = 0):
+        for relation in RELATION_TYPES:
+            setattr(self, relation, RelationIndex(size))
+
+    def __getitem__(self, relation: str) -> RelationIndex:
+        if relation not in RELATION_TYPES:
+            raise KeyError(relation)
+        return getattr(self, relation)
+
+    def __setitem__(self, relation: str, index: RelationIndex):
+        if relation not in RELATION_TYPES:
+            raise KeyError(relation)
+        setattr(self, relation, index)
+
+
+class RelationView:
+    """Списковое представление связей одного жителя поверх RelationIndex"""
+    __slots__ = ('_index', '_node')
+
+    def __init__(self, index: RelationIndex, node: int):
+        self._index = index
+        self._node = node
+
+    def __len__(self) -> int:
+        return self._index.degree(self._node)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._index.neighbors(self._node).tolist())
+
+    def __contains__(self, other) -> bool:
+        return self._index.has(self._node, other)
+
+    def __getitem__(self, item):
+        return self._index.neighbors(self._node).tolist()[item]
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, (list, tuple, RelationView)):
+            return NotImplemented
+        return list(self) == list(other)
+
+    def __repr__(self) -> str:
+        return repr(list(self))
+
+    def append(self, other: int):
+        self._index.add(self._node, other)
+
+    def extend(self, others: Iterable[int]):
+        for other in others:
+            self._index.add(self._node, other)
+
+    def remove(self, other: int):
+        if not self._index.remove(self._node, other):
+            raise ValueError(f"{other} not in relations")
+
+    def clear(self):
+        self._index.set_row(self._node, ())
@@ -1,12 +1,21 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 import numpy as np
 from mesa import Model, Agent
 from mesa.space import NetworkGrid
 import networkx as nx
 from datetime import datetime, timedelta
 import random
+import logging
+import copy
+import os
+import pickle
+from pathlib import Path
 
-from .agent import VillageResident, Demographics, Personality, Skills
+from .agent import VillageResident
+from .agent_state import AgentState
+from .social import RELATION_TYPES, Relations, RelationIndex, sample_initial_links
+
+logger = logging.getLogger('village_simulation')
 
 class VillageModel(Model):
     def __init__(
@@ -14,16 +23,30 @@ class VillageModel(Model):
         num_agents: int = 200,
         start_date: datetime = datetime(2025, 1, 1),
         simulation_years: int = 10,
-        seed: int = None
+        seed: int = None,
+        vectorized: bool = False,
+        aggregate_check_interval: int = 30,
+        expected_degree: Optional[float] = None
     ):
         super().__init__(seed=seed)
         self.num_agents = num_agents
+        # Векторизованный режим шага: состояние жителей обновляется пакетно
+        self.vectorized = vectorized
+        self.agent_state = AgentState(num_agents)
+        # Раз в N дней текущие суммы сверяются с полным пересчётом
+        self.aggregate_check_interval = aggregate_check_interval
+        self._days_since_check = 0
+        # Среднее число начальных связей, которые заводит житель; None - вероятность связи
+        # 0.1-0.3 с каждым жителем (число связей растёт как N^2)
+        self.expected_degree = expected_degree
         self.current_date = start_date
         self.end_date = start_date + timedelta(days=365 * simulation_years)
         
         # Создание социальной сети
         self.G = nx.Graph()
         self.grid = NetworkGrid(self.G)
+        # Связи жителей по типам (ID -> ID), см. social.RelationIndex
+        self.relations = Relations(num_agents)
         
         # Экономические показатели деревни
         self.economy = {
@@ -57,78 +80,75 @@ class VillageModel(Model):
         
     def _create_initial_population(self):
         """Создание начальной популяции агентов"""
-        agents = []
-        for i in range(self.num_agents):
-            # Генерация демографических данных
-            age = int(np.random.normal(30, 15))
-            age = max(0, min(90, age))
-            gender = np.random.choice(['M', 'F'])
-            marital_status = np.random.choice(['single', 'married', 'widowed'], p=[0.3, 0.6, 0.1])
-            education = np.random.choice(['none', 'basic', 'advanced'], p=[0.2, 0.7, 0.1])
-            
-            demographics = Demographics(
-                age=age,
-                gender=gender,
-                marital_status=marital_status,
-                education_level=education
-            )
-            
-            # Генерация личностных характеристик
-            personality = Personality(
-                sociability=np.random.beta(2, 2),
-                diligence=np.random.beta(2, 2),
-                ambition=np.random.beta(2, 2),
-                risk_tolerance=np.random.beta(2, 2)
-            )
-            
-            # Генерация навыков
-            skills = Skills(
-                agriculture=np.random.beta(2, 2),
-                crafts=np.random.beta(2, 2),
-                trading=np.random.beta(2, 2),
-                management=np.random.beta(2, 2)
-            )
-            
-            agent = VillageResident(
-                unique_id=i,
-                model=self,
-                demographics=demographics,
-                personality=personality,
-                skills=skills
-            )
-            
-            agents.append(agent)
-            self.G.add_node(agent.unique_id)
+        n = self.num_agents
+        state = self.agent_state
+        rows = state.add_many(n)
+        
+        # Генерация демографических данных (по одному вызову на признак,
+        # категории сразу в кодах AgentState)
+        state.age[rows] = np.clip(np.random.normal(30, 15, n).astype(int), 0, 90)
+        state.gender[rows] = np.random.choice(2, n)  # M, F
+        state.marital_status[rows] = np.random.choice(3, n, p=[0.3, 0.6, 0.1])  # single, married, widowed
+        state.education_level[rows] = np.random.choice(3, n, p=[0.2, 0.7, 0.1])  # none, basic, advanced
+        
+        # Генерация личностных характеристик и навыков
+        traits = np.random.beta(2, 2, (8, n))
+        for column, values in zip(
+            ('sociability', 'diligence', 'ambition', 'risk_tolerance',
+             'agriculture', 'crafts', 'trading', 'management'),
+            traits
+        ):
+            getattr(state, column)[rows] = values
+        
+        agents = [
+            VillageResident.from_state(unique_id=i, model=self, index=row)
+            for i, row in enumerate(rows.tolist())
+        ]
+        self.G.add_nodes_from(range(n))
         
         # Добавляем всех агентов в модель
         self.village_agents = agents
     
     def _establish_initial_relationships(self):
         """Установление начальных социальных связей"""
-        # Создание семейных связей
-        for agent in self.village_agents:
-            # Вероятность создания связи зависит от социальности агента
-            connection_probability = 0.1 + agent.personality.sociability * 0.2
-            
-            for other in self.village_agents:
-                if agent != other and np.random.random() < connection_probability:
-                    self.G.add_edge(agent.unique_id, other.unique_id)
-                    
-                    # Определение типа связи
-                    if abs(agent.demographics.age - other.demographics.age) <= 5:
-                        agent.friends.append(other.unique_id)
-                    elif abs(agent.demographics.age - other.demographics.age) >= 20:
-                        if np.random.random() < 0.3:  # 30% шанс быть семьей
-                            agent.family.append(other.unique_id)
-                    
-                    # Соседи (на основе случайной близости)
-                    if np.random.random() < 0.2:
-                        agent.neighbors.append(other.unique_id)
+        agents = self.village_agents
+        if not agents:
+            return
+        
+        # Вероятность создания связи зависит от социальности агента
+        rows = np.array([agent.row for agent in agents])
+        sociability = self.agent_state.sociability[rows]
+        ages = self.agent_state.age[rows].astype(np.int64)
+        connection_probability = 0.1 + sociability * 0.2
+        if self.expected_degree is not None and len(agents) > 1:
+            # Масштабирование сохраняет различия по социальности
+            scale = self.expected_degree / (connection_probability.mean() * (len(agents) - 1))
+            connection_probability = np.minimum(1.0, connection_probability * scale)
+        
+        # Связи выбираются без перебора всех пар (см. sample_initial_links)
+        src, dst = sample_initial_links(connection_probability)
+        ids = np.array([agent.unique_id for agent in agents])
+        self.G.add_edges_from(zip(ids[src].tolist(), ids[dst].tolist()))
+        
+        # Определение типа связи
+        age_gap = np.abs(ages[src] - ages[dst])
+        is_friend = age_gap <= 5
+        is_family = (age_gap >= 20) & (np.random.random(len(src)) < 0.3)  # 30% шанс быть семьей
+        # Соседи (на основе случайной близости)
+        is_neighbor = np.random.random(len(src)) < 0.2
+        
+        # Индексы связей строятся сразу в CSR (пары уже упорядочены по src)
+        size = int(ids.max()) + 1
+        for relation, mask in (('friends', is_friend), ('family', is_family), ('neighbors', is_neighbor)):
+            self.relations[relation] = RelationIndex.from_pairs(size, ids[src[mask]], ids[dst[mask]])
     
     def update_relationship(self, agent1, agent2):
         """Обновление отношений между двумя жителями"""
+        friends = self.relations.friends
+        family = self.relations.family
+        
         # Если они уже друзья, увеличиваем их счастье
-        if agent2 in agent1.friends:
+        if friends.has(agent1.unique_id, agent2.unique_id):
             agent1.happiness = min(1.0, agent1.happiness + 0.01)
             agent2.happiness = min(1.0, agent2.happiness + 0.01)
             return
@@ -138,8 +158,8 @@ class VillageModel(Model):
         
         if random.random() < compatibility:
             # Становятся друзьями
-            agent1.friends.append(agent2)
-            agent2.friends.append(agent1)
+            friends.add(agent1.unique_id, agent2.unique_id)
+            friends.add(agent2.unique_id, agent1.unique_id)
             agent1.happiness = min(1.0, agent1.happiness + 0.05)
             agent2.happiness = min(1.0, agent2.happiness + 0.05)
             
@@ -155,8 +175,8 @@ class VillageModel(Model):
                 if random.random() < 0.1:  # 10% шанс на брак
                     agent1.demographics.marital_status = 'married'
                     agent2.demographics.marital_status = 'married'
-                    agent1.family.append(agent2)
-                    agent2.family.append(agent1)
+                    family.add(agent1.unique_id, agent2.unique_id)
+                    family.add(agent2.unique_id, agent1.unique_id)
                     self.social_metrics['marriages'] += 1
 
     def _calculate_compatibility(self, agent1, agent2):
@@ -182,12 +202,129 @@ class VillageModel(Model):
         
         return min(1.0, compatibility)
 
+    def update_relationships(self, first, second):
+        """Пакетное обновление отношений для массивов пар жителей.
+        
+        first[k], second[k] - индексы жителей в village_agents (в модели они
+        совпадают с unique_id и строками agent_state). Правила и метрики те же,
+        что у update_relationship; повторы одной пары в пакете обрабатываются
+        по очереди, как при последовательных вызовах.
+        """
+        first = np.asarray(first, dtype=np.int64)
+        second = np.asarray(second, dtype=np.int64)
+        keep = first != second
+        first, second = first[keep], second[keep]
+        if not len(first):
+            return
+        
+        # Номер повтора неупорядоченной пары внутри пакета
+        size = self.agent_state.size
+        keys = np.minimum(first, second) * size + np.maximum(first, second)
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        group_start = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+        group_sizes = np.diff(np.r_[group_start, len(keys)])
+        repeat = np.empty(len(keys), dtype=np.int64)
+        repeat[order] = np.arange(len(keys)) - np.repeat(group_start, group_sizes)
+        
+        for round_number in range(int(repeat.max()) + 1):
+            selected = repeat == round_number
+            self._update_relationships_round(first[selected], second[selected])
+    
+    def _update_relationships_round(self, first, second):
+        """Один проход пакетного обновления по различным парам"""
+        state = self.agent_state
+        friends = self.relations.friends
+        family = self.relations.family
+        happiness = state.happiness
+        
+        # Уже друзья - небольшой прирост счастья
+        already = friends.has_many(first, second)
+        bonus = np.where(already, 0.01, 0.0)
+        
+        # Шанс подружиться зависит от их совместимости
+        compatibility = self._calculate_compatibility_many(first, second)
+        befriend = ~already & (np.random.random(len(first)) < compatibility)
+        bonus[befriend] = 0.05
+        
+        touched = np.unique(np.concatenate([first, second]))
+        happiness_before = happiness[touched]
+        np.add.at(happiness, first, bonus)
+        np.add.at(happiness, second, bonus)
+        happiness[touched] = np.minimum(1.0, happiness[touched])
+        state.add_to_total('happiness', (happiness[touched] - happiness_before).sum())
+        
+        # Становятся друзьями
+        a, b = first[befriend], second[befriend]
+        friends.add_many(np.concatenate([a, b]), np.concatenate([b, a]))
+        self.social_metrics['friendships'] += len(a)
+        
+        # Шанс на брак, если они подходят друг другу
+        single = state.code('marital_status', 'single')
+        married = state.code('marital_status', 'married')
+        candidates = np.flatnonzero(
+            (state.marital_status[a] == single) &
+            (state.marital_status[b] == single) &
+            (state.gender[a] != state.gender[b]) &
+            (np.abs(state.age[a].astype(np.int64) - state.age[b]) < 10)
+        )
+        wed = candidates[np.random.random(len(candidates)) < 0.1]  # 10% шанс на брак
+        
+        # Браки заключаются по порядку: житель не может вступить в два брака за пакет
+        for k in wed.tolist():
+            i, j = int(a[k]), int(b[k])
+            if state.marital_status[i] == single and state.marital_status[j] == single:
+                state.marital_status[i] = married
+                state.marital_status[j] = married
+                family.add(i, j)
+                family.add(j, i)
+                self.social_metrics['marriages'] += 1
+    
+    def _calculate_compatibility_many(self, first, second) -> np.ndarray:
+        """Пакетный расчет совместимости для пар жителей"""
+        state = self.agent_state
+        age_gap = np.abs(state.age[first].astype(np.int64) - state.age[second])
+        compatibility = (
+            0.3  # Базовый шанс
+            + 0.1 * (age_gap < 10)
+            + 0.1 * (state.education_level[first] == state.education_level[second])
+            + 0.2 * (state.job[first] == state.job[second])
+            + 0.1 * (np.abs(state.wealth[first] - state.wealth[second]) < 1000)
+        )
+        return np.minimum(1.0, compatibility)
+
     def step(self):
         """Один шаг симуляции"""
         # Обновляем дату
         self.current_date += timedelta(days=1)
         
-        # Обновляем состояние каждого жителя
+        # Обновляем состояние жителей
+        if self.vectorized:
+            self._step_vectorized()
+        else:
+            self._step_agents()
+        
+        # Периодическая сверка текущих сумм
+        self._days_since_check += 1
+        if self._days_since_check >= self.aggregate_check_interval:
+            self._verify_aggregates()
+        
+        # Обновляем экономику
+        self._update_economy()
+        
+        # Обновляем социальные метрики
+        self._update_social_metrics()
+        
+        # Еженедельный анализ
+        if self.current_date.weekday() == 6:  # воскресенье
+            self._weekly_analysis()
+            
+        # Ежемесячный анализ
+        if self.current_date.day == 1:
+            self._monthly_analysis()
+    
+    def _step_agents(self):
+        """Поагентное обновление состояния жителей"""
         for agent in self.village_agents:
             # Обновление энергии
             agent.energy = min(1.0, agent.energy + random.uniform(0.1, 0.2))
@@ -211,29 +348,69 @@ class VillageModel(Model):
                 agent.happiness = max(0.0, agent.happiness - 0.1)
             elif agent.wealth > 1000:
                 agent.happiness = min(1.0, agent.happiness + 0.05)
+    
+    def _step_vectorized(self):
+        """Пакетное обновление состояния жителей над массивами.
         
-        # Обновляем экономику
-        self._update_economy()
+        Повторяет правила _step_agents с теми же распределениями,
+        но одной операцией над всеми жителями вместо цикла.
+        """
+        state = self.agent_state
+        n = state.size
+        energy = state.energy[:n]
+        health = state.health[:n]
+        happiness = state.happiness[:n]
+        wealth = state.wealth[:n]
+        happiness_before = happiness.copy()
         
-        # Обновляем социальные метрики
-        self._update_social_metrics()
+        # Обновление энергии
+        energy += np.random.uniform(0.1, 0.2, n)
+        np.minimum(energy, 1.0, out=energy)
+        tired = energy < 0.2
+        happiness[tired] = np.maximum(0.0, happiness[tired] - 0.1)
         
-        # Еженедельный анализ
-        if self.current_date.weekday() == 6:  # воскресенье
-            self._weekly_analysis()
-            
-        # Ежемесячный анализ
-        if self.current_date.day == 1:
-            self._monthly_analysis()
+        # Обновление здоровья (5% шанс изменения)
+        changed = np.random.random(n) < 0.05
+        health_change = np.random.uniform(-0.1, 0.1, int(changed.sum()))
+        health[changed] = np.clip(health[changed] + health_change, 0.0, 1.0)
+        
+        # Доход от работы (randint включает верхнюю границу, numpy - нет)
+        employed = state.job[:n] != 0
+        new_wealth = wealth + np.where(employed, np.random.randint(10, 51, n), 0)
+        
+        # Расходы на жизнь
+        new_wealth -= np.random.randint(5, 21, n)
+        np.maximum(new_wealth, 0.0, out=new_wealth)
+        state.add_to_total('wealth', (new_wealth - wealth).sum())
+        wealth[:] = new_wealth
+        
+        # Влияние богатства на счастье
+        poor = wealth < 100
+        rich = wealth > 1000
+        happiness[poor] = np.maximum(0.0, happiness[poor] - 0.1)
+        happiness[rich] = np.minimum(1.0, happiness[rich] + 0.05)
+        state.add_to_total('happiness', (happiness - happiness_before).sum())
+    
+    def _verify_aggregates(self):
+        """Сверка текущих сумм с полным пересчётом по массивам"""
+        self._days_since_check = 0
+        drift = self.agent_state.verify_totals()
+        for column, value in drift.items():
+            if abs(value) > 1e-6 * max(1.0, abs(self.agent_state.totals[column])):
+                logger.warning(f"Расхождение текущей суммы {column}: {value:.6g}")
     
     def _update_economy(self):
         """Обновление экономических показателей"""
-        self.economy['total_wealth'] = sum(agent.wealth for agent in self.village_agents)
+        # Текущая сумма поддерживается кодом, изменяющим богатство (O(1))
+        self.economy['total_wealth'] = self.agent_state.totals['wealth']
         # TODO: Реализовать более сложную экономическую логику
     
     def _update_social_metrics(self):
         """Обновление социальных показателей"""
-        self.social_metrics['average_happiness'] = np.mean([agent.happiness for agent in self.village_agents])
+        state = self.agent_state
+        self.social_metrics['average_happiness'] = (
+            state.totals['happiness'] / state.size if state.size else 0.0
+        )
         # TODO: Обновление других социальных метрик
     
     def _weekly_analysis(self):
@@ -246,6 +423,98 @@ class VillageModel(Model):
         # TODO: Реализовать анализ месячных показателей
         pass
     
+    def snapshot(self) -> Dict[str, Any]:
+        """Полное состояние модели для продолжения прогона с того же места.
+        
+        Включает массивы жителей, связи, граф, экономику, социальные
+        метрики, дату и состояния генераторов random, np.random и Mesa.
+        """
+        edges = np.array(self.G.edges, dtype=np.int64).reshape(-1, 2)
+        return {
+            'num_agents': self.num_agents,
+            'current_date': self.current_date,
+            'end_date': self.end_date,
+            'vectorized': self.vectorized,
+            'aggregate_check_interval': self.aggregate_check_interval,
+            'expected_degree': self.expected_degree,
+            'days_since_check': self._days_since_check,
+            'agent_ids': np.array([agent.unique_id for agent in self.village_agents], dtype=np.int64),
+            'agent_rows': np.array([agent.row for agent in self.village_agents], dtype=np.int64),
+            'owned_resources': {
+                agent.unique_id: dict(agent._owned_resources)
+                for agent in self.village_agents if agent._owned_resources
+            },
+            'agent_state': self.agent_state.snapshot(),
+            'relations': {
+                relation: tuple(array.copy() for array in self.relations[relation].csr())
+                for relation in RELATION_TYPES
+            },
+            'graph_nodes': np.array(self.G.nodes, dtype=np.int64),
+            'graph_edges': edges,
+            'economy': copy.deepcopy(self.economy),
+            'social_metrics': copy.deepcopy(self.social_metrics),
+            'model_seed': self._seed,
+            'rng_states': {
+                'random': random.getstate(),
+                'numpy': np.random.get_state(),
+                'model': self.random.getstate(),
+            },
+        }
+    
+    @classmethod
+    def from_snapshot(cls, snapshot: Dict[str, Any]) -> 'VillageModel':
+        """Восстановление модели из snapshot(), включая состояния генераторов"""
+        model = cls(
+            num_agents=0,
+            start_date=snapshot['current_date'],
+            seed=snapshot['model_seed'],
+            vectorized=snapshot['vectorized'],
+            aggregate_check_interval=snapshot['aggregate_check_interval'],
+            expected_degree=snapshot.get('expected_degree')
+        )
+        model.num_agents = snapshot['num_agents']
+        model.end_date = snapshot['end_date']
+        model._days_since_check = snapshot['days_since_check']
+        model.agent_state = AgentState.from_snapshot(snapshot['agent_state'])
+        for relation, (indptr, indices) in snapshot['relations'].items():
+            model.relations[relation] = RelationIndex.from_csr(indptr, indices)
+        
+        model.G.add_nodes_from(snapshot['graph_nodes'].tolist())
+        model.G.add_edges_from(snapshot['graph_edges'].tolist())
+        
+        model.village_agents = [
+            VillageResident.from_state(unique_id=unique_id, model=model, index=row)
+            for unique_id, row in zip(snapshot['agent_ids'].tolist(), snapshot['agent_rows'].tolist())
+        ]
+        for agent in model.village_agents:
+            resources = snapshot['owned_resources'].get(agent.unique_id)
+            if resources:
+                agent.owned_resources = dict(resources)
+        
+        model.economy = copy.deepcopy(snapshot['economy'])
+        model.social_metrics = copy.deepcopy(snapshot['social_metrics'])
+        
+        random.setstate(snapshot['rng_states']['random'])
+        np.random.set_state(snapshot['rng_states']['numpy'])
+        model.random.setstate(snapshot['rng_states']['model'])
+        return model
+    
+    def save_checkpoint(self, path, extra: Dict[str, Any] = None):
+        """Запись snapshot() на диск (атомарно, через временный файл)"""
+        path = Path(path)
+        payload = {'snapshot': self.snapshot(), 'extra': extra or {}}
+        tmp_path = path.with_name(path.name + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    
+    @classmethod
+    def load_checkpoint(cls, path) -> Tuple['VillageModel', Dict[str, Any]]:
+        """Загрузка модели из save_checkpoint(); возвращает (модель, extra)"""
+        with open(path, 'rb') as f:
+            payload = pickle.load(f)
+        return cls.from_snapshot(payload['snapshot']), payload['extra']
+    
     def get_statistics(self) -> Dict[str, Any]:
         """Получение текущей статистики модели"""
         return {